@@ -1,7 +1,41 @@
+import os
 import streamlit as st
 import pandas as pd
 import time
-from course_logic import load_data, get_prepared_courses_and_settings, get_recommended_schedule, process_past_courses
+from course_logic import load_data, get_prepared_courses_and_settings, get_recommended_schedule, get_recommended_schedules, process_past_courses
+from schedule_profile import new_profile, profile_table
+from catalog import load_course_details
+from course_index import get_search_index, search_courses
+from schedule_service import request_schedules, request_course_search, request_course_details, request_departments, request_past_course_state
+
+# 設定此環境變數 (如 http://127.0.0.1:8765) 時改由 schedule_service.py 排課，本程式不載入課程資料
+SERVICE_URL = os.environ.get('COURSE_SERVICE_URL')
+
+@st.cache_resource
+def load_shared_data():
+    """所有 session 共用同一份課程表，讓篩選索引與快取在重新執行之間保留"""
+    return load_data()
+
+@st.cache_resource
+def load_search_index():
+    """課程搜尋索引只在第一次執行時建立，之後每次重新執行直接沿用"""
+    return get_search_index(load_shared_data()[0])
+
+@st.cache_resource
+def load_departments():
+    if SERVICE_URL: return request_departments(SERVICE_URL)
+    return sorted(load_search_index()['depts'])
+
+def find_courses(query, dept):
+    if SERVICE_URL: return request_course_search(SERVICE_URL, query, dept or None)
+    return search_courses(load_search_index(), query, dept or None)
+
+def course_picker(label, key, dept, help=None):
+    """輸入時即時查詢課程索引，選單只列出已選的課程與目前的搜尋結果，不必送出完整課名清單"""
+    query = st.text_input(f"搜尋：{label}", key=f"{key}_query", placeholder="輸入課名、英文課名或科號")
+    selected = st.session_state.get(key, [])
+    matches = find_courses(query, dept) if query or dept else []
+    return st.multiselect(label, options=list(dict.fromkeys(selected + matches)), key=key, help=help)
 
 def set_null_time_schedule():
     schedule_data = {'M': ['-'] * 13, 'T': ['-'] * 13, 'W': ['-'] * 13, 'R': ['-'] * 13, 'F': ['-'] * 13, 'S': ['-'] * 13}
@@ -25,8 +59,8 @@ def main_app():
     st.title("清華大學資工系課程推薦系統")
     st.info("本系統旨在幫助資工系學生根據畢業門檻和個人偏好，智慧推薦未來的修課排程。")
 
-    all_courses_df, cs_learn_df = load_data()
-    if all_courses_df is None or cs_learn_df is None:
+    all_courses_df, cs_learn_df = (None, None) if SERVICE_URL else load_shared_data()
+    if not SERVICE_URL and (all_courses_df is None or cs_learn_df is None):
         st.error("嚴重錯誤：無法載入課程資料，請檢查 `data` 資料夾。")
         return
 
@@ -41,15 +75,16 @@ def main_app():
             help="如果您是大一新生，請選0。如果您剛完成大二下，請選4。"
         )
 
+        # 課程搜尋的系所篩選，套用到以下所有課程選單
+        dept = st.selectbox("課程搜尋範圍", [''] + load_departments(), format_func=lambda x: x or "全部系所")
+
         # 選擇已修過的課程
-        all_course_names = sorted(all_courses_df['中文課名'].unique().tolist())
-        past_courses = st.multiselect(
-            "請選擇您已修過的課程",
-            options=all_course_names,
-            help="系統將會自動辨識這些課程的學分屬性。"
-        )
+        past_courses = course_picker("請選擇您已修過的課程", 'past_courses', dept, help="系統將會自動辨識這些課程的學分屬性。")
 
-        initial_state_suggestion = process_past_courses(past_courses, all_courses_df, cs_learn_df, all_courses_df[all_courses_df['系所全名'] == '通識教育中心'])
+        if SERVICE_URL:
+            initial_state_suggestion = request_past_course_state(SERVICE_URL, past_courses)
+        else:
+            initial_state_suggestion = process_past_courses(past_courses, all_courses_df, cs_learn_df, all_courses_df[all_courses_df['系所全名'] == '通識教育中心'])
 
         st.header("未來學期設定")
         st.subheader("英語課程設定")
@@ -67,9 +102,12 @@ def main_app():
         SelectNumberList = st.multiselect("選擇額外想修的科系", ['1', '2'], format_func=lambda x: {'1': '數學系', '2': '物理系'}.get(x))
         SelectCourse = st.radio("選擇基礎科學系列課程", ['X', 'Y', 'Z'], format_func=lambda x: {'X':'普通物理B','Y':'普通化學','Z':'生命科學'}.get(x))
         SelectType = st.selectbox("選擇不想優先修習的專業選修類別", ['A', 'B', 'C', 'D'], format_func=lambda x: f"{x} 類")
-        wanted_courses = st.multiselect("選擇想優先修習的特定課程", all_course_names)
-        unwanted_courses = st.multiselect("選擇不想上的特定課程", all_course_names)
+        wanted_courses = course_picker("選擇想優先修習的特定課程", 'wanted_courses', dept)
+        unwanted_courses = course_picker("選擇不想上的特定課程", 'unwanted_courses', dept)
         
+        scheduler = st.radio("排課演算法", ['greedy', 'search'], format_func=lambda x: {'greedy': '快速 (逐門排入)', 'search': '最佳化搜尋 (較慢，必修較不易衝堂)'}.get(x), horizontal=True)
+        plan_count = st.slider("同時產生的課表方案數", min_value=1, max_value=5, value=1, help="大於 1 時會並列顯示多份不同的推薦課表供比較。")
+
         st.write("---")
         st.write("未來各學期期望學分")
         CreditList = []
@@ -89,9 +127,22 @@ def main_app():
                 "english_level": english_level, "elec_eng_option": elec_eng_option,
                 "SelectNumberList": SelectNumberList, "SelectCourse": SelectCourse, "SelectType": SelectType,
                 "CreditList": CreditList, "unwanted_courses": unwanted_courses, "wanted_courses": wanted_courses,
+                "scheduler": scheduler,
             }
-            AllCoursesData, GEclassData, AddCourseABCD = get_prepared_courses_and_settings(all_courses_df, user_settings)
-            course_lists, credits, total_credits, initial_state = get_recommended_schedule(user_settings, AllCoursesData, GEclassData, AddCourseABCD, cs_learn_df)
+            profile = None
+            if SERVICE_URL:
+                # 排課服務會合併相同設定的並行請求並快取結果
+                results = request_schedules(SERVICE_URL, user_settings, k=plan_count)
+            elif plan_count > 1:
+                AllCoursesData, GEclassData, AddCourseABCD = get_prepared_courses_and_settings(all_courses_df, user_settings)
+                results = get_recommended_schedules(user_settings, AllCoursesData, GEclassData, AddCourseABCD, cs_learn_df, k=plan_count)
+            else:
+                AllCoursesData, GEclassData, AddCourseABCD = get_prepared_courses_and_settings(all_courses_df, user_settings)
+                # 保留上次排課的各階段檢查點，只改一項設定時從受影響的階段繼續排
+                checkpoints = st.session_state.setdefault('schedule_checkpoints', {})
+                profile = new_profile()
+                results = [get_recommended_schedule(user_settings, AllCoursesData, GEclassData, AddCourseABCD, cs_learn_df, checkpoints=checkpoints, profile=profile)]
+            course_lists, credits, total_credits, initial_state = results[0]
                 
         st.success("課表產生成功！")
         
@@ -115,9 +166,33 @@ def main_app():
                     st.markdown("##### 視覺化課表")
                     st.write(schedule_df_filled.to_html(escape=False), unsafe_allow_html=True)
                     st.markdown("##### 課程清單")
-                    st.dataframe(course_lists[i][['科號', '中文課名', '學分', '教師', '上課時間']])
+                    # 英文課名、教室等欄位不在精簡目錄中，顯示時才讀取 (服務模式下由排課服務讀取，本機不需要 data 資料夾)
+                    if SERVICE_URL: details = request_course_details(SERVICE_URL, course_lists[i]['科號'], ['英文課名', '教室'])
+                    else: details = load_course_details(course_lists[i]['科號'], ['英文課名', '教室'])
+                    st.dataframe(course_lists[i][['科號', '中文課名', '學分', '教師', '上課時間']].join(details, on='科號'))
                 else:
                     st.write("本學期沒有排課。")
+
+        if len(results) > 1:
+            st.subheader("課表方案比較")
+            cols = st.columns(len(results))
+            for j, (_, _, plan_total, plan_state) in enumerate(results):
+                cols[j].metric(f"方案{j+1}", f"{plan_total} 學分", f"滿足 {len(plan_state['fulfilled_reqs'])} 項需求", delta_color="off")
+            for i in range(completed_semesters, 8):
+                with st.expander(f"📚 **{semesters_all[i]}** - 方案比較", expanded=False):
+                    cols = st.columns(len(results))
+                    for j, (plan_lists, plan_credits, _, _) in enumerate(results):
+                        cols[j].markdown(f"**方案{j+1}** ( {int(plan_credits[i])} 學分 )")
+                        if not plan_lists[i].empty:
+                            cols[j].dataframe(plan_lists[i][['中文課名', '學分', '上課時間']], hide_index=True)
+                        else:
+                            cols[j].write("本學期沒有排課。")
+
+        if profile is not None:
+            with st.expander("排課診斷資訊", expanded=False):
+                st.dataframe(profile_table(profile), hide_index=True)
+                if profile['resumed_from']: st.caption(f"本次從「{profile['resumed_from']}」階段的檢查點續排")
+                if profile['dropped']: st.warning("因衝堂或學分限制無法排入: " + "、".join(profile['dropped']))
     else:
         st.info("請在左方側邊欄完成您的個人化設定後，點擊按鈕開始產生課表。")
 
@@ -0,0 +1,202 @@
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import tracemalloc
+from contextlib import redirect_stdout
+import numpy as np
+import pandas as pd
+import course_logic
+from catalog import SOURCE_CSV, TEXT_COLUMNS, NUMERIC_COLUMNS, load_catalog
+from course_logic import load_data, get_prepared_courses_and_settings, process_past_courses, get_recommended_schedule
+
+BENCHMARK_DIR = './data/benchmark'
+BASELINE_PATH = './benchmark_baseline.json'
+DEFAULT_SCALES = [1, 10, 100]
+DEFAULT_REPEAT = 5
+DEFAULT_TOLERANCE = 0.5  # 比基準慢 (或多用記憶體) 超過 50% 視為退步
+MIN_REGRESSION_MS = 5.0  # 低於此差距的耗時變化視為量測誤差
+MIN_REGRESSION_MB = 1.0
+DAYS = 'MTWRFS'
+
+# 設定組合：涵蓋新生/已修課程、各種額外科系與選修類別、兩種排課演算法
+SETTINGS_PROFILES = {
+    'freshman': dict(SelectNumberList=[], SelectCourse='X', SelectType='A', CreditList=[16, 16, 18, 20, 20, 20, 9, 9],
+                     english_level='前標', elec_eng_option="請推薦2門「選修英文」"),
+    'wanted': dict(SelectNumberList=['1', '2'], SelectCourse='Y', SelectType='C', CreditList=[20, 20, 20, 20, 12, 12, 12, 12],
+                   english_level='頂標', elec_eng_option="請推薦2門「選修英文」",
+                   unwanted_courses=['軟體工程'], wanted_courses=['機器學習概論', '線性代數']),
+    'sophomore': dict(SelectNumberList=['2'], SelectCourse='Z', SelectType='D', CreditList=[20, 20, 20, 20, 25, 25, 25, 25],
+                      english_level='前標', elec_eng_option="我已滿足此要求", completed_semesters=2,
+                      past_courses=['微積分Ｂ一', '微積分Ｂ二', '中高級英文（一）', '計算機程式設計一', '普通物理Ｂ一']),
+    'search': dict(SelectNumberList=[], SelectCourse='X', SelectType='B', CreditList=[20, 20, 20, 20, 12, 12, 12, 12],
+                   english_level='前標', elec_eng_option="請推薦2門「選修英文」", scheduler='search', search_time_limit=1.0),
+}
+
+
+def synthetic_paths(scale):
+    """scale 倍合成目錄的 (CSV 路徑, 編譯後目錄)；scale 為 1 時即為隨附的原始資料"""
+    if scale == 1: return SOURCE_CSV, os.path.join(BENCHMARK_DIR, 'x1')
+    return os.path.join(BENCHMARK_DIR, f'all_done_x{scale}.csv'), os.path.join(BENCHMARK_DIR, f'x{scale}')
+
+
+def write_synthetic_csv(scale, path, source_csv=SOURCE_CSV):
+    """
+    以原始 CSV 的欄位格式產生 scale 倍大的課程表：第 k 份複本的科號在年級碼前插入 'x{k}' 以保持唯一，
+    上課時間的星期依序平移 k 天，課名不變 (相當於同一門課開更多班)。逐份附加寫入，不需一次持有整份資料。
+    """
+    base = pd.read_csv(source_csv, usecols=TEXT_COLUMNS + NUMERIC_COLUMNS)
+    codes = base['科號'].astype(str)
+    times = base['上課時間']
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp'
+    for k in range(scale):
+        copy = base.copy()
+        if k:
+            copy['科號'] = codes.str[:-6] + f'x{k}' + codes.str[-6:]
+            shift = k % len(DAYS)
+            copy['上課時間'] = times.str.translate(str.maketrans(DAYS, DAYS[shift:] + DAYS[:shift]))
+        copy.to_csv(tmp_path, mode='w' if k == 0 else 'a', header=k == 0, index=False)
+    os.replace(tmp_path, path)
+
+
+def prepare_scale(scale):
+    """確保 scale 倍的合成 CSV 與編譯後目錄存在，回傳 (CSV 路徑, 目錄路徑)"""
+    source_csv, catalog_dir = synthetic_paths(scale)
+    if not os.path.exists(source_csv):
+        print(f"正在產生 {scale} 倍合成課程表...", file=sys.stderr)
+        write_synthetic_csv(scale, source_csv)
+    load_catalog(source_csv, catalog_dir)  # 先編譯好目錄，量測 load_data 時只計入開啟目錄的成本
+    return source_csv, catalog_dir
+
+
+def schedule_fingerprint(course_lists, total_credits):
+    """以排入的科號與學期計算排課結果的指紋，用來偵測結果改變"""
+    codes = '|'.join(','.join(df['科號'].astype(str)) if not df.empty else '' for df in course_lists)
+    return f"{int(total_credits)}:{hashlib.sha1(codes.encode('utf-8')).hexdigest()[:12]}"
+
+
+def measure(func, repeat):
+    """執行 func repeat 次量測耗時，再於 tracemalloc 下多執行一次量測記憶體高峰；回傳 (統計, 最後一次的回傳值)"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        samples.append((time.perf_counter() - start) * 1000)
+    tracemalloc.start()
+    try:
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    stats = {'p50_ms': float(np.percentile(samples, 50)), 'p90_ms': float(np.percentile(samples, 90)),
+             'p99_ms': float(np.percentile(samples, 99)), 'peak_mb': peak / 2**20}
+    return stats, result
+
+
+def run_benchmarks(scales=DEFAULT_SCALES, profiles=None, repeat=DEFAULT_REPEAT):
+    """對每個規模與設定組合量測各步驟，回傳 {'scale/步驟/設定': 統計} (載入步驟與設定無關，以 '-' 表示)"""
+    profiles = profiles or list(SETTINGS_PROFILES)
+    results = {}
+    for scale in scales:
+        source_csv, catalog_dir = prepare_scale(scale)
+        stats, (all_courses_df, cs_learn_df) = measure(lambda: load_data(source_csv, catalog_dir), repeat)
+        stats['rows'] = len(all_courses_df)
+        results[f'{scale}/load_data/-'] = stats
+        ge_df = all_courses_df[all_courses_df['系所全名'] == '通識教育中心']
+
+        def prepare_cold(settings):
+            # 清掉課程表索引與篩選快取，量測第一次準備的成本
+            course_logic._CATALOG_INDEXES.clear()
+            return get_prepared_courses_and_settings(all_courses_df, settings)
+
+        for name in profiles:
+            settings = SETTINGS_PROFILES[name]
+            print(f"[{scale}x] {name}", file=sys.stderr)
+            results[f'{scale}/prepare/{name}'], frames = measure(lambda: prepare_cold(settings), repeat)
+            results[f'{scale}/past_courses/{name}'], _ = measure(
+                lambda: process_past_courses(settings.get('past_courses') or [], all_courses_df, cs_learn_df, ge_df), repeat)
+            with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+                stats, (course_lists, _, total_credits, initial_state) = measure(
+                    lambda: get_recommended_schedule(dict(settings), *frames, cs_learn_df), repeat)
+            # 搜尋因時間上限提前結束時，結果取決於機器速度，不記錄指紋
+            if initial_state.get('search_stats', {}).get('complete', True):
+                stats['result'] = schedule_fingerprint(course_lists, total_credits)
+            results[f'{scale}/schedule/{name}'] = stats
+        del all_courses_df, ge_df
+        course_logic._CATALOG_INDEXES.clear()
+    return results
+
+
+def results_table(results):
+    rows = []
+    for key, stats in results.items():
+        scale, step, profile = key.split('/')
+        rows.append(dict({'規模': f'{scale}x', '步驟': step, '設定': profile}, **{k: round(v, 2) if isinstance(v, float) else v for k, v in stats.items()}))
+    return pd.DataFrame(rows, dtype=object).fillna('')
+
+
+def find_regressions(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """與基準比較 p50 耗時、記憶體高峰與排課結果指紋，回傳退步項目的說明清單 (基準中沒有的項目略過)"""
+    problems = []
+    for key, stats in results.items():
+        base = baseline.get(key)
+        if base is None: continue
+        if stats['p50_ms'] > base['p50_ms'] * (1 + tolerance) and stats['p50_ms'] - base['p50_ms'] > MIN_REGRESSION_MS:
+            problems.append(f"{key}: p50 {base['p50_ms']:.1f}ms -> {stats['p50_ms']:.1f}ms")
+        if stats['peak_mb'] > base['peak_mb'] * (1 + tolerance) and stats['peak_mb'] - base['peak_mb'] > MIN_REGRESSION_MB:
+            problems.append(f"{key}: 記憶體高峰 {base['peak_mb']:.1f}MB -> {stats['peak_mb']:.1f}MB")
+        if 'result' in base and stats.get('result') != base['result']:
+            problems.append(f"{key}: 排課結果改變 ({base['result']} -> {stats.get('result')})")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="清大課程推薦系統 - 效能基準測試")
+    parser.add_argument('--scales', nargs='+', type=int, default=DEFAULT_SCALES,
+                        help=f"課程表放大倍數，1 為隨附資料 (預設: {' '.join(map(str, DEFAULT_SCALES))}；1000 倍約需數 GB 磁碟空間)")
+    parser.add_argument('--profiles', nargs='+', choices=list(SETTINGS_PROFILES), default=None,
+                        help="要量測的設定組合 (預設: 全部)")
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT,
+                        help=f"每項量測的重複次數 (預設: {DEFAULT_REPEAT})")
+    parser.add_argument('--baseline', default=BASELINE_PATH,
+                        help=f"基準結果檔 (預設: {BASELINE_PATH})")
+    parser.add_argument('--save-baseline', action='store_true',
+                        help="將本次結果寫入基準檔，而不是與基準比較")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help=f"允許比基準慢或多用記憶體的比例 (預設: {DEFAULT_TOLERANCE})")
+    parser.add_argument('--json', metavar='PATH',
+                        help="另將本次結果以 JSON 寫入此檔")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.scales, args.profiles, args.repeat)
+    print(results_table(results).to_string(index=False))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=1)
+
+    if args.save_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, encoding='utf-8') as f:
+                baseline = json.load(f)
+        baseline.update(results)  # 只更新本次量測到的項目
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(baseline, f, ensure_ascii=False, indent=1, sort_keys=True)
+        print(f"\n已更新基準檔 {args.baseline}")
+        return
+    if not os.path.exists(args.baseline):
+        print(f"\n找不到基準檔 {args.baseline}，以 --save-baseline 建立")
+        return
+    with open(args.baseline, encoding='utf-8') as f:
+        problems = find_regressions(results, json.load(f), args.tolerance)
+    if problems:
+        print("\n效能或結果退步:\n" + "\n".join(problems))
+        sys.exit(1)
+    print("\n與基準相比沒有退步")
+
+
+if __name__ == '__main__':
+    main()
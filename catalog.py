@@ -0,0 +1,202 @@
+import os
+import json
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+
+WEEKDAY_MAPPING = {'M': 0, 'T': 1, 'W': 2, 'R': 3, 'F': 4, 'S': 5}
+NUMBER_MAPPING = {'1': 0, '2': 1, '3': 2, '4': 3, 'n': 4, '5': 5, '6': 6, '7': 7, '8': 8, '9': 9, 'a': 10, 'b': 11, 'c': 12}
+PERIODS_PER_DAY = len(NUMBER_MAPPING)
+
+SOURCE_CSV = './data/all_done.csv'
+CATALOG_DIR = './data/catalog'
+CATALOG_VERSION = 4
+# 排課實際用到的欄位；文字欄位以字典編碼 (代碼 + 類別表) 儲存，數值欄位直接存成 float64
+TEXT_COLUMNS = ['科號', '中文課名', '上課時間', '教師', '系所全名', '通識分類']
+NUMERIC_COLUMNS = ['學分', '等級制']
+# 載入為 category 的文字欄位 (科號每列皆不同，不適合)
+CATEGORICAL_COLUMNS = ['中文課名', '上課時間', '教師', '系所全名', '通識分類']
+# 不放進目錄、只在顯示課程清單時才讀取的欄位
+DETAIL_COLUMNS = ['英文課名', '教室', '授課語言', '備註欄']
+MASK_COLUMN = '時段遮罩'
+
+
+@lru_cache(maxsize=None)
+def parse_time_mask(time_str):
+    """將上課時間字串 (如 'M3M4R7') 轉為 6x13 週課表上的位元遮罩，格式錯誤時回傳 None"""
+    time_str = str(time_str).replace(',', '')
+    if len(time_str) % 2 != 0: return None
+    mask = 0
+    for i in range(0, len(time_str), 2):
+        day, period = time_str[i], time_str[i+1]
+        if day not in WEEKDAY_MAPPING or period not in NUMBER_MAPPING: return None
+        mask |= 1 << (WEEKDAY_MAPPING[day] * PERIODS_PER_DAY + NUMBER_MAPPING[period])
+    return mask
+
+
+def course_year(code):
+    """科號倒數第 6 碼為建議修習年級；回傳 0 表示不限年級 (包含通識 GEC 課程與無法解析的科號)"""
+    try:
+        year = int(str(code)[-6])
+    except (ValueError, IndexError):
+        return 0
+    return 0 if 'GEC' in str(code) else year
+
+
+def course_term(code):
+    """科號前 5 碼為學年期，第 4 碼為學期別：回傳 1 (上學期) 或 2 (下學期)；其他學期別或無法解析時回傳 0 表示不限"""
+    code = str(code)
+    return int(code[3]) if code[:5].isdigit() and code[3] in '12' else 0
+
+
+def year_allowed(code, semester):
+    """非通識 (GEC) 且有指定年級的課程只能排在該年級的學期"""
+    year = course_year(code)
+    return year <= 0 or year == (semester // 2) + 1
+
+
+def term_allowed(code, semester):
+    """上學期開的課只能排在各年級的上學期 (semester 為偶數)，下學期開的課只能排在下學期"""
+    term = course_term(code)
+    return term == 0 or term == (semester % 2) + 1
+
+
+def allowed_semesters(code):
+    """year_allowed 與 term_allowed 皆成立的所有學期 (0-7)，一次算出而不必逐學期檢查"""
+    year, term = course_year(code), course_term(code)
+    semesters = range(2 * year - 2, min(2 * year, 8)) if year > 0 else range(8)
+    return [sem for sem in semesters if term == 0 or term == (sem % 2) + 1]
+
+
+def _source_signature(path):
+    stat = os.stat(path)
+    return {'path': os.path.basename(path), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def encode_rows(df, categories):
+    """將 df 的排課欄位編碼為陣列；文字欄位沿用 categories 中既有的類別代碼，新出現的值附加在類別表後 (就地修改)"""
+    arrays = {}
+    for col in TEXT_COLUMNS:
+        values = df[col].astype(str).fillna('') if col == '上課時間' else df[col]
+        codes, uniques = pd.factorize(values)
+        known = categories.setdefault(col, [])
+        position = {value: i for i, value in enumerate(known)}
+        remap = np.full(len(uniques) + 1, -1, dtype=np.int32)  # 最後一格讓代碼 -1 (缺值) 維持 -1
+        for i, value in enumerate(uniques):
+            value = str(value)
+            if value not in position:
+                position[value] = len(known); known.append(value)
+            remap[i] = position[value]
+        arrays[col] = remap[codes]
+    for col in NUMERIC_COLUMNS:
+        arrays[col] = pd.to_numeric(df[col], errors='coerce').to_numpy(dtype=np.float64)
+    # 時段遮罩不另外儲存，載入時由 catalog_to_frame 依上課時間的類別表計算
+    return arrays
+
+
+def compile_catalog(source_csv=SOURCE_CSV):
+    """讀取原始 CSV，回傳 (各欄位陣列, 中繼資料)"""
+    df = pd.read_csv(source_csv, usecols=TEXT_COLUMNS + NUMERIC_COLUMNS)
+    categories = {}
+    arrays = encode_rows(df, categories)
+    meta = {'version': CATALOG_VERSION, 'rows': len(df), 'source': _source_signature(source_csv), 'categories': categories}
+    return arrays, meta
+
+
+def append_catalog(arrays, meta, df, source_csv=SOURCE_CSV, catalog_dir=CATALOG_DIR):
+    """
+    將已附加到原始 CSV 的新列 df 併入已編譯的目錄，不必重新讀取整份 CSV；
+    呼叫前 source_csv 須已寫入這些列，目錄會記錄新的來源簽章，之後 load_catalog 不會再重新編譯。
+    """
+    categories = {col: list(values) for col, values in meta['categories'].items()}
+    added = encode_rows(df, categories)
+    arrays = {name: np.concatenate([np.asarray(arrays[name]), added[name]]) for name in added}
+    meta = dict(meta, rows=meta['rows'] + len(df), source=_source_signature(source_csv), categories=categories)
+    save_catalog(arrays, meta, catalog_dir)
+    return arrays, meta
+
+
+def save_catalog(arrays, meta, catalog_dir=CATALOG_DIR):
+    """
+    將編譯後的目錄寫成一組 .npy 檔；meta.json 最後寫入，作為完成標記。
+    每個檔案先寫到暫存檔再取代，其他行程仍以 memory map 開著的舊檔不受影響。
+    """
+    os.makedirs(catalog_dir, exist_ok=True)
+    meta_path = os.path.join(catalog_dir, 'meta.json')
+    if os.path.exists(meta_path): os.remove(meta_path)
+    for i, (name, arr) in enumerate(arrays.items()):
+        path = os.path.join(catalog_dir, f'{i:02d}.npy')
+        with open(path + '.tmp', 'wb') as f:
+            np.save(f, arr)
+        os.replace(path + '.tmp', path)
+    meta = dict(meta, arrays=list(arrays))
+    with open(meta_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False)
+
+
+def open_catalog(catalog_dir=CATALOG_DIR):
+    """以 memory map 開啟已編譯的目錄，回傳 (各欄位陣列, 中繼資料)；不存在時回傳 (None, None)"""
+    try:
+        with open(os.path.join(catalog_dir, 'meta.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+        arrays = {name: np.load(os.path.join(catalog_dir, f'{i:02d}.npy'), mmap_mode='r') for i, name in enumerate(meta['arrays'])}
+        return arrays, meta
+    except (OSError, ValueError, KeyError):
+        return None, None
+
+
+def catalog_to_frame(arrays, meta):
+    """
+    將欄位陣列還原為排課使用的精簡 DataFrame：重複度高的文字欄位為 category (直接沿用目錄中的代碼與類別表)，
+    科號每列皆不同，維持一般字串；時段遮罩依上課時間的類別查表，相同時間的課程共用同一個整數物件。
+    """
+    data = {}
+    for col in TEXT_COLUMNS:
+        if col in CATEGORICAL_COLUMNS:
+            # 代碼 -1 即為缺值；另加入空字串類別，讓 fillna('') 不必新增類別
+            categories = meta['categories'][col]
+            values = pd.Categorical.from_codes(np.asarray(arrays[col]), categories)
+            data[col] = values if '' in categories else values.add_categories('')
+        else:
+            values = np.array(meta['categories'][col] + [np.nan], dtype=object)
+            data[col] = values[arrays[col]]  # 代碼 -1 對應到最後的 NaN
+    for col in NUMERIC_COLUMNS:
+        data[col] = np.asarray(arrays[col])
+    slot_masks = [parse_time_mask(t) for t in meta['categories']['上課時間']]
+    mask_table = np.array([-1 if m is None else m for m in slot_masks] + [-1], dtype=object)
+    data[MASK_COLUMN] = mask_table[arrays['上課時間']]
+    return pd.DataFrame(data)
+
+
+def load_course_details(codes, columns=DETAIL_COLUMNS, source_csv=SOURCE_CSV):
+    """只在顯示時才從原始 CSV 讀取精簡目錄未收錄的欄位 (如英文課名、教室)；回傳以科號為索引的 DataFrame"""
+    details = _read_details(source_csv, tuple(columns), tuple(_source_signature(source_csv).values()))
+    return details.reindex(pd.Index(codes).drop_duplicates())
+
+
+@lru_cache(maxsize=1)
+def _read_details(source_csv, columns, signature):
+    # signature 只作為快取鍵，原始 CSV 變動時重新讀取
+    return pd.read_csv(source_csv, usecols=['科號'] + list(columns)).drop_duplicates(subset=['科號']).set_index('科號')
+
+
+def build_catalog(source_csv=SOURCE_CSV, catalog_dir=CATALOG_DIR):
+    arrays, meta = compile_catalog(source_csv)
+    save_catalog(arrays, meta, catalog_dir)
+    return arrays, meta
+
+
+def load_catalog(source_csv=SOURCE_CSV, catalog_dir=CATALOG_DIR):
+    """開啟已編譯的目錄；原始 CSV 有變動 (或目錄不存在) 時重新編譯"""
+    arrays, meta = open_catalog(catalog_dir)
+    signature = _source_signature(source_csv)
+    if meta is None or meta.get('version') != CATALOG_VERSION or meta.get('source') != signature:
+        arrays, meta = compile_catalog(source_csv)
+        try: save_catalog(arrays, meta, catalog_dir)
+        except OSError: pass  # 資料夾不可寫入時 (如雲端部署) 直接使用記憶體中的結果
+    return catalog_to_frame(arrays, meta)
+
+
+if __name__ == '__main__':
+    _, meta = build_catalog()
+    print(f"已編譯 {meta['rows']} 筆課程至 {CATALOG_DIR}")
@@ -1,5 +1,67 @@
+import os
+import sys
+import json
 import argparse
-from course_logic import load_data, get_prepared_courses_and_settings, get_recommended_schedule
+from contextlib import redirect_stdout
+import pandas as pd
+from course_logic import ELEC_ENG_OPTIONS, load_data, get_prepared_courses_and_settings, get_recommended_schedule, get_recommended_schedules
+from course_search import DEFAULT_SEARCH_TIME_LIMIT
+from credit_sweep import sweep_credit_plans
+from schedule_profile import new_profile, timed, format_profile, profile_to_json
+from schedule_service import SEMESTERS, OUTPUT_COLUMNS, schedule_to_record, request_schedules
+from shared_data import set_shared, get_shared, shared_pool
+
+def _schedule_one(job):
+    index, line, base_settings = job
+    try:
+        settings = dict(base_settings, **json.loads(line))
+        all_courses_df, cs_learn_df = get_shared('course_data')
+        with redirect_stdout(sys.stderr):  # 排課警告不可混入 JSONL 輸出
+            AllCoursesData, GEclassData, AddCourseABCD = get_prepared_courses_and_settings(all_courses_df, settings)
+            course_lists, credits, total_credits, _ = get_recommended_schedule(settings, AllCoursesData, GEclassData, AddCourseABCD, cs_learn_df)
+        record = schedule_to_record(course_lists, credits, total_credits)
+    except Exception as e:
+        record = {'error': f"{type(e).__name__}: {e}"}
+    return json.dumps(dict({'index': index}, **record), ensure_ascii=False, default=str)
+
+def run_batch(path, workers, base_settings):
+    """讀取每行一組設定的 JSONL 檔，以多行程平行排課，並依輸入順序逐行輸出 JSONL 結果"""
+    course_data = load_data()
+    if course_data[0] is None:
+        print("無法載入課程資料", file=sys.stderr)
+        return
+    with open(path, encoding='utf-8') as f:
+        jobs = [(i, line, base_settings) for i, line in enumerate(f) if line.strip()]
+    workers = workers or os.cpu_count() or 1  # 與 ProcessPoolExecutor 的預設行程數一致，chunksize 依實際行程數計算
+    set_shared('course_data', course_data)
+    with shared_pool('course_data', workers, loader=load_data) as executor:
+        for output in executor.map(_schedule_one, jobs, chunksize=max(1, len(jobs) // (8 * workers))):
+            print(output, flush=True)
+
+def print_alternatives(results):
+    """將多份推薦課表逐學期並列輸出"""
+    labels = [f"方案{i+1}" for i in range(len(results))]
+    print("\n==================== 推薦課表方案比較 ====================")
+    print(pd.DataFrame({label: [total_credits, len(initial_state['fulfilled_reqs'])] for label, (_, _, total_credits, initial_state) in zip(labels, results)},
+                       index=['推薦總學分', '已滿足需求']).to_string())
+    for i, sem in enumerate(SEMESTERS):
+        print(f"\n--- {sem} ---")
+        columns = {}
+        for label, (course_lists, credits, _, _) in zip(labels, results):
+            names = course_lists[i]['中文課名'].tolist() if not course_lists[i].empty else []
+            columns[f"{label} ({credits[i]} 學分)"] = pd.Series(names, dtype=object)
+        print(pd.DataFrame(columns).fillna('').to_string(index=False))
+
+def print_schedule(course_lists, credits, total_credits):
+    print("\n==================== 推薦課表結果 ====================")
+    print(f"推薦總學分: {total_credits}\n")
+    for i, sem in enumerate(SEMESTERS):
+        print(f"--- {sem} ({credits[i]} 學分) ---")
+        if not course_lists[i].empty:
+            print(course_lists[i][OUTPUT_COLUMNS[:4]].to_string(index=False))
+        else:
+            print("本學期沒有排課。")
+        print("\n")
 
 def main():
     parser = argparse.ArgumentParser(description="清大課程推薦系統 - 命令列工具")
@@ -14,8 +76,30 @@ def main():
                         help="不想優先修習的專業選修類別")
     parser.add_argument('--eng-type', nargs=2, default=['1', '2'],
                         help="想修習的2種選修英文代碼")
-    
+    parser.add_argument('--eng-level', choices=['前標', '頂標'], default='前標',
+                        help="英文能力分級 (預設: 前標)")
+    parser.add_argument('--elec-eng', choices=ELEC_ENG_OPTIONS,
+                        default=ELEC_ENG_OPTIONS[0], help="選修英文/外語的處理方式")
+    parser.add_argument('--scheduler', choices=['greedy', 'search'], default='greedy',
+                        help="排課演算法 (greedy: 逐門貪婪排入, search: 分支定界搜尋)")
+    parser.add_argument('--time-limit', type=float, default=DEFAULT_SEARCH_TIME_LIMIT,
+                        help=f"search 演算法的時間上限秒數 (預設: {DEFAULT_SEARCH_TIME_LIMIT})")
+    parser.add_argument('--top-k', type=int, default=1, metavar='K',
+                        help="並列顯示 K 份不同的推薦課表 (預設: 1)")
+    parser.add_argument('--sweep', nargs='+', metavar='PLAN',
+                        help="比較多組學分規劃，每組為逗號分隔的 8 個學分數 (如 20,20,20,20,12,12,12,12)")
+    parser.add_argument('--batch', metavar='SETTINGS_JSONL',
+                        help="批次模式：每行一組 JSON 設定 (覆蓋命令列預設值)，結果以 JSONL 輸出至 stdout")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="批次模式與 --sweep 的平行行程數 (批次模式預設: CPU 核心數)")
+    parser.add_argument('--server', metavar='URL',
+                        help="改由已啟動的排課服務 (schedule_service.py，如 http://127.0.0.1:8765) 排課，不在本機載入課程資料")
+    parser.add_argument('--profile', nargs='?', const='table', choices=['table', 'json'],
+                        help="輸出各排課階段的耗時、候選課程數與拒絕原因統計 (table 或 json，預設: table)")
+
     args = parser.parse_args()
+    if args.workers is not None and args.workers < 1:
+        parser.error("--workers 須為正整數")
 
     # 收集設定
     user_settings = {
@@ -25,30 +109,60 @@ def main():
         "SelectCourse": args.select_course,
         "SelectType": args.avoid_type,
         "CreditList": args.credits,
+        "english_level": args.eng_level,
+        "elec_eng_option": args.elec_eng,
+        "scheduler": args.scheduler,
+        "search_time_limit": args.time_limit,
     }
-    
+
+    if args.batch:
+        run_batch(args.batch, args.workers, user_settings)
+        return
+
     print("設定:", user_settings)
+    if args.server:
+        print(f"\n正在向 {args.server} 取得推薦課表...")
+        results = request_schedules(args.server, user_settings, k=args.top_k)
+        if args.top_k > 1: print_alternatives(results)
+        else: print_schedule(*results[0][:3])
+        return
+    profile = new_profile() if args.profile else None
     print("\n正在載入課程資料...")
-    all_courses_df, cs_learn_df = load_data()
+    with timed(profile, 'load_data'):
+        all_courses_df, cs_learn_df = load_data()
     if all_courses_df is None:
         return
 
     print("正在準備課程與設定...")
-    AllCoursesData, GEclassData, AddCourseABCD = get_prepared_courses_and_settings(all_courses_df, user_settings)
-    
+    with timed(profile, 'prepare'):
+        AllCoursesData, GEclassData, AddCourseABCD = get_prepared_courses_and_settings(all_courses_df, user_settings)
+
+    if args.sweep:
+        try:
+            credit_plans = [[int(c) for c in plan.split(',')] for plan in args.sweep]
+        except ValueError:
+            parser.error("--sweep 的每組學分須為以逗號分隔的整數")
+        if any(len(plan) != 8 for plan in credit_plans):
+            parser.error("--sweep 的每組學分須包含 8 個學期")
+        print("正在比較學分規劃...")
+        table, pareto = sweep_credit_plans(user_settings, AllCoursesData, GEclassData, AddCourseABCD, cs_learn_df, credit_plans, workers=args.workers or 1)
+        print("\n==================== 學分規劃比較 ====================")
+        print(table.to_string(index=False))
+        print("\n柏拉圖最適方案 (總學分與平均等級制無法同時被其他方案超越):")
+        print(pareto[['方案', 'CreditList', '總學分', '平均等級制']].to_string(index=False))
+        return
+
+    if args.top_k > 1:
+        print("正在搜尋替代方案...")
+        print_alternatives(get_recommended_schedules(user_settings, AllCoursesData, GEclassData, AddCourseABCD, cs_learn_df, k=args.top_k))
+        return
+
     print("正在執行排課演算法...")
-    course_lists, credits, total_credits = get_recommended_schedule(user_settings, AllCoursesData, GEclassData, AddCourseABCD, cs_learn_df)
-    
-    print("\n==================== 推薦課表結果 ====================")
-    print(f"推薦總學分: {total_credits}\n")
-    semesters = ["大一上", "大一下", "大二上", "大二下", "大三上", "大三下", "大四上", "大四下"]
-    for i, sem in enumerate(semesters):
-        print(f"--- {sem} ({credits[i]} 學分) ---")
-        if not course_lists[i].empty:
-            print(course_lists[i][['科號', '中文課名', '學分', '教師']].to_string(index=False))
-        else:
-            print("本學期沒有排課。")
-        print("\n")
+    course_lists, credits, total_credits, _ = get_recommended_schedule(user_settings, AllCoursesData, GEclassData, AddCourseABCD, cs_learn_df, profile=profile)
+    print_schedule(course_lists, credits, total_credits)
+
+    if profile is not None:
+        print(json.dumps(profile_to_json(profile), ensure_ascii=False, indent=2) if args.profile == 'json' else format_profile(profile))
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,119 @@
+import numpy as np
+import pandas as pd
+from catalog import SOURCE_CSV
+from course_logic import get_catalog_index
+
+DEFAULT_LIMIT = 20
+# 排序用的比對類別，數字越小越前面
+EXACT, NAME_PREFIX, NAME_MATCH, CODE_PREFIX, OTHER_MATCH = range(5)
+
+
+def _normalize(text):
+    """比對前統一大小寫並去掉空白，讓「machine learning」也能對到「Machine Learning」"""
+    return ''.join(str(text).lower().split())
+
+
+def _grams(text):
+    """查詢字串的二字元片段；單一字元時回傳該字元本身"""
+    return {text[i:i + 2] for i in range(len(text) - 1)} or {text}
+
+
+def _grams_of_entry(parts):
+    """課程搜尋字串的所有單一字元與二字元片段 (不跨越課名、英文課名與科號之間)"""
+    grams = set()
+    for part in parts:
+        grams.update(part)
+        grams.update(part[i:i + 2] for i in range(len(part) - 1))
+    return grams
+
+
+def _match_kind(index, i, key):
+    """課名編號 i 與查詢字串的比對類別；不相符時回傳 None"""
+    name, codes = index['keys'][i], index['codes'][i]
+    if name == key: return EXACT
+    if name.startswith(key): return NAME_PREFIX
+    if key in name: return NAME_MATCH
+    if '\n' + key in codes: return CODE_PREFIX
+    if key in codes or key in index['texts'][i]: return OTHER_MATCH
+    return None
+
+
+def build_search_index(df, name_rows, english_names):
+    """
+    以中文課名為單位建立課程搜尋索引：每個課名的搜尋字串由課名、所有英文課名與科號組成，
+    再建立單一字元與二字元片段 -> 課名編號的倒排表，以及系所全名 -> 課名編號。
+    課名編號依課名長度排序，倒排表內再依比對類別排序，查詢恰為一個片段時不需逐一比對即可取出排名。
+    name_rows 為 get_catalog_index(df)['name']；english_names 為與 df 各列對應的英文課名 (不在精簡目錄中)。
+    """
+    names = sorted(name_rows, key=lambda name: (len(name), name))
+    entries = np.full(len(df), -1, dtype=np.int32)  # 列位置 -> 課名編號
+    for i, name in enumerate(names): entries[name_rows[name]] = i
+    has_name = entries >= 0
+
+    english, codes = [set() for _ in names], [set() for _ in names]
+    for i, en, code in zip(entries[has_name].tolist(), np.asarray(english_names, dtype=object)[has_name].tolist(), df['科號'][has_name].tolist()):
+        if isinstance(en, str) and en: english[i].add(_normalize(en))
+        if isinstance(code, str) and code:
+            code = _normalize(code)
+            codes[i].update((code, code[5:]))  # 科號前 5 碼為學年期，另存去掉學年期的部分供開頭比對 (如 cs23)
+    # 英文課名與科號各以換行串接 (科號前也加換行)，比對時只需一次子字串搜尋
+    index = {
+        'names': names, 'keys': [_normalize(name) for name in names],
+        'texts': ['\n'.join(sorted(text)) for text in english], 'codes': [''.join('\n' + code for code in sorted(entry)) for entry in codes],
+    }
+
+    grams = {}
+    for i, key in enumerate(index['keys']):
+        for gram in _grams_of_entry([key, *english[i], *codes[i]]):
+            grams.setdefault(gram, []).append((_match_kind(index, i, gram), i))
+    index['grams'] = {gram: np.array([i for _, i in sorted(ids)], dtype=np.int32) for gram, ids in grams.items()}
+    dept_rows = df.groupby('系所全名', sort=False, observed=True).indices
+    index['depts'] = {dept: np.setdiff1d(entries[pos], [-1]) for dept, pos in dept_rows.items()}
+    return index
+
+
+def read_english_names(df, source_csv=SOURCE_CSV):
+    """從原始 CSV 讀一次英文課名，依科號對應到 df 的各列；讀完即丟棄，不留在常駐的課程表或快取中"""
+    english = pd.read_csv(source_csv, usecols=['科號', '英文課名']).drop_duplicates(subset=['科號']).set_index('科號')['英文課名']
+    return english.reindex(df['科號']).to_numpy(dtype=object)
+
+
+def get_search_index(df, source_csv=SOURCE_CSV):
+    """取得 (必要時建立) 課程表的搜尋索引，與 get_catalog_index 的其他索引一起快取"""
+    catalog_index = get_catalog_index(df)
+    if 'search' not in catalog_index:
+        catalog_index['search'] = build_search_index(df, catalog_index['name'], read_english_names(df, source_csv))
+    return catalog_index['search']
+
+
+def search_courses(index, query, dept=None, limit=DEFAULT_LIMIT):
+    """
+    以課名、英文課名或科號的任意子字串搜尋課程，可再以系所全名篩選；回傳最多 limit 個中文課名。
+    依「課名完全相同、課名開頭相符、課名包含、科號開頭相符、英文課名或其他科號包含」排序，同類別中較短的課名在前。
+    """
+    key = _normalize(query)
+    dept_ids = index['depts'].get(dept, np.array([], dtype=np.int32)) if dept else None
+    if not key:
+        return [] if dept_ids is None else [index['names'][i] for i in dept_ids[:limit].tolist()]
+
+    grams = _grams(key)
+    if len(key) <= 2:
+        # 查詢本身就是一個片段：倒排表已依排名排序，只需依系所篩選
+        ranked = index['grams'].get(grams.pop(), np.array([], dtype=np.int32))
+        if dept_ids is not None: ranked = ranked[np.isin(ranked, dept_ids)]
+        return [index['names'][i] for i in ranked[:limit].tolist()]
+
+    # 從最短的倒排表開始取交集，每多一個片段候選就更少；最後逐一確認片段確實相連
+    postings = sorted((index['grams'].get(gram) for gram in grams), key=lambda ids: -1 if ids is None else len(ids))
+    if postings[0] is None: return []
+    candidates = dept_ids
+    for ids in postings:
+        candidates = ids if candidates is None else np.intersect1d(candidates, ids, assume_unique=True)
+        if not len(candidates): return []
+    ranked = []
+    for i in candidates.tolist():
+        kind = _match_kind(index, i, key)
+        if kind is not None: ranked.append((kind, i))
+    ranked.sort()
+    return [index['names'][i] for _, i in ranked[:limit]]
+
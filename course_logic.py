@@ -1,9 +1,17 @@
 import pandas as pd
 import numpy as np
 from itertools import accumulate
+from functools import lru_cache, partial
+from collections import OrderedDict
+import io
+import copy
+import heapq
+import time
+from contextlib import redirect_stdout
+from catalog import MASK_COLUMN, course_year, course_term, year_allowed, term_allowed, load_catalog, SOURCE_CSV, CATALOG_DIR
+from schedule_profile import new_phase_stats, timed
+from course_search import DEFAULT_SEARCH_TIME_LIMIT, DEFAULT_BEAM_WIDTH, branch_and_bound_schedule, beam_search_schedules
 
-WEEKDAY_MAPPING = {'M': 0, 'T': 1, 'W': 2, 'R': 3, 'F': 4, 'S': 5}
-NUMBER_MAPPING = {'1': 0, '2': 1, '3': 2, '4': 3, 'n': 4, '5': 5, '6': 6, '7': 7, '8': 8, '9': 9, 'a': 10, 'b': 11, 'c': 12}
 SUBSTITUTE_MAP = {
     '微積分Ｂ一': ['微積分一(數學系)', '微積分Ａ一'],
     '微積分Ｂ二': ['微積分二(數學系)', '微積分Ａ二'],
@@ -12,45 +20,76 @@ SUBSTITUTE_MAP = {
 }
 REVERSE_SUB_MAP = {sub: base for base, subs in SUBSTITUTE_MAP.items() for sub in subs}
 ENG_REQ_COURSES = {"前標": ["中高級英文（一）", "中高級英文（二）"], "頂標": ["中高級英文（三）", "中高級英文（四）"]}
+ELEC_ENG_OPTIONS = ["請推薦2門「選修英文」", "請用2門「外語課」代替", "我已滿足此要求"]
 FOREIGN_LANG_DEPTS = ["外國語文學系", "日本語言文化學系"]
 
-
-def load_data():
+def load_data(source_csv=SOURCE_CSV, catalog_dir=CATALOG_DIR):
     try:
-        all_courses_df = pd.read_csv('./data/all_done.csv')
+        all_courses_df = load_catalog(source_csv, catalog_dir)
         cs_learn_df = pd.read_csv('./data/cslearn.csv')
-        all_courses_df['上課時間'] = all_courses_df['上課時間'].astype(str).fillna('')
         return all_courses_df, cs_learn_df
     except FileNotFoundError: return None, None
 
+PREPARED_CACHE_SIZE = 32
+_CATALOG_INDEXES = OrderedDict()  # id(df) -> 該課程表的索引與快取，只保留最近使用的幾份課程表
+
+
+def get_catalog_index(df):
+    """取得 (必要時建立) 課程表依系所全名與中文課名的列位置索引，以及該課程表的篩選結果快取"""
+    index = _CATALOG_INDEXES.get(id(df))
+    if index is None or index['df'] is not df:
+        index = {
+            'df': df, 'keep_all': np.ones(len(df), dtype=bool),
+            'dept': df.groupby('系所全名', sort=False, observed=True).indices,
+            'name': df.groupby('中文課名', sort=False, observed=True).indices,
+        }
+        index['prepare'] = lru_cache(maxsize=PREPARED_CACHE_SIZE)(partial(_prepare_courses, index))
+        _CATALOG_INDEXES[id(df)] = index
+        if len(_CATALOG_INDEXES) > 4: _CATALOG_INDEXES.popitem(last=False)
+    else:
+        _CATALOG_INDEXES.move_to_end(id(df))
+    return index
+
 def get_prepared_courses_and_settings(df, settings):
     """
     此函式整合了課程篩選和 ABCD 類選修的邏輯。
+    結果只取決於 unwanted_courses、SelectNumberList 與 SelectType，依此快取；回傳的 DataFrame 為共用物件，請勿修改。
     """
-    unwanted_courses = settings.get('unwanted_courses', [])
+    key = (frozenset(settings.get('unwanted_courses') or []), frozenset(settings['SelectNumberList']), settings['SelectType'])
+    return get_catalog_index(df)['prepare'](*key)
+
+def _prepare_courses(index, unwanted_courses, select_numbers, select_type):
+    df = index['df']
+    keep = index['keep_all']
     if unwanted_courses:
-        df = df[~df['中文課名'].isin(unwanted_courses)].copy()
-
-    CSclassData = df[df['系所全名'] == '資訊工程學系'].dropna(subset=['科號', '中文課名', '學分', '上課時間'])
-    EECSclassData = df[df['系所全名'] == '電機資訊學院學士班'].dropna(subset=['科號', '中文課名', '學分', '上課時間'])
-    GEclassData = df[df['系所全名'] == '通識教育中心'].dropna(subset=['科號', '中文課名', '學分', '上課時間'])
-    LANGclassData = df[(df['系所全名'] == '英語教育中心(110起)') | (df['系所全名'] == '英語教育中心')].dropna(subset=['科號', '中文課名', '學分', '上課時間'])
-    CLclassData = df[(df['系所全名'] == '中國文學系') & (df['中文課名'] == '大學中文')].dropna(subset=['科號', '中文課名', '學分', '上課時間'])
-    base_frames = [CSclassData, EECSclassData, GEclassData, LANGclassData, CLclassData]
-    AllCoursesData = pd.concat(base_frames, ignore_index=True)
+        keep = keep.copy()
+        for name in unwanted_courses: keep[index['name'].get(name, [])] = False
+
+    def rows(kind, keys):
+        """依索引取出符合的列 (維持原課程表順序)，並排除不想上的課程"""
+        found = [index[kind][k] for k in keys if k in index[kind]]
+        pos = np.sort(np.concatenate(found)) if found else np.array([], dtype=np.intp)
+        return df.iloc[pos[keep[pos]]]
+
+    required = ['科號', '中文課名', '學分', '上課時間']
+    CSclassData = rows('dept', ['資訊工程學系']).dropna(subset=required)
+    EECSclassData = rows('dept', ['電機資訊學院學士班']).dropna(subset=required)
+    GEclassData = rows('dept', ['通識教育中心']).dropna(subset=required)
+    LANGclassData = rows('dept', ['英語教育中心(110起)', '英語教育中心']).dropna(subset=required)
+    CLclassData = rows('dept', ['中國文學系'])
+    CLclassData = CLclassData[CLclassData['中文課名'] == '大學中文'].dropna(subset=required)
+    frames = [CSclassData, EECSclassData, GEclassData, LANGclassData, CLclassData]
     listAdd = ['微積分Ｂ一','微積分Ｂ二','普通物理Ｂ一','普通物理Ｂ二','普通化學一','普通化學二','生命科學一','生命科學二',
                '微積分一(數學系)', '微積分Ａ一', '微積分二(數學系)', '微積分Ａ二',
                '普通物理一(物理系)', '普通物理Ａ一', '普通物理二(物理系)', '普通物理Ａ二']
     for course_name in listAdd:
-        AddclassData = df[df['中文課名'] == course_name].dropna(subset=['科號', '系所全名', '學分'])
-        AllCoursesData = pd.concat([AllCoursesData, AddclassData], ignore_index=True)
+        frames.append(rows('name', [course_name]).dropna(subset=['科號', '系所全名', '學分']))
 
-    if "1" in settings['SelectNumberList']:
-        MATHclassData = df[df['系所全名'] == '數學系'].dropna(subset=['科號', '中文課名', '學分', '上課時間'])
-        AllCoursesData = pd.concat([AllCoursesData, MATHclassData], ignore_index=True)
-    if "2" in settings['SelectNumberList']:
-        PHYSclassData = df[df['系所全名'] == '物理學系'].dropna(subset=['科號', '中文課名', '學分', '上課時間'])
-        AllCoursesData = pd.concat([AllCoursesData, PHYSclassData], ignore_index=True)
+    if "1" in select_numbers:
+        frames.append(rows('dept', ['數學系']).dropna(subset=required))
+    if "2" in select_numbers:
+        frames.append(rows('dept', ['物理學系']).dropna(subset=required))
+    AllCoursesData = pd.concat(frames, ignore_index=True)
 
     # eng_map = {'1': '演說與簡報', '2': '新聞英文選讀', '3': '短篇故事選讀', '4': '影視英語聽講','5': '中英口譯', '6': '職場英語寫作', '7': '小說選讀', '8': '中英文筆譯','9': '學術英語聽力', '10': '職場英語口語表達'}
     # for code in settings['EnglishNameList']:
@@ -66,19 +105,19 @@ def get_prepared_courses_and_settings(df, settings):
     AllCoursesData = AllCoursesData.drop_duplicates(subset=['科號', '上課時間']).reset_index(drop=True)
     
     Type = [['常微分方程','訊號與系統','正規語言','數值最佳化','量子計算概論'],['電路與電子學一','積體電路設計概論','嵌入式系統概論','編譯器設計','超大型積體電路系統設計'],['計算機網路概論','軟體工程','密碼與網路安全概論','平行計算概論'],['資料庫系統概論','人工智慧概論','多媒體技術概論','機器學習概論']]
-    type_map = {'A': 0, 'B': 1, 'C': 2, 'D': 3}; jump = type_map.get(settings['SelectType'], -1)
-    AddCourseABCD, listvisited = pd.DataFrame(), []
+    type_map = {'A': 0, 'B': 1, 'C': 2, 'D': 3}; jump = type_map.get(select_type, -1)
+    ABCDframes, listvisited = [], []
 
     for t in range(4):
         if t == jump: continue
-        AddCourseS = df[df['中文課名'].isin(Type[t]) & ~df['中文課名'].isin(listvisited)].nlargest(1, '等級制')
+        AddCourseS = rows('name', [c for c in Type[t] if c not in listvisited]).nlargest(1, '等級制')
         if not AddCourseS.empty:
             listvisited.append(AddCourseS.iloc[0]['中文課名'])
-            AddCourseABCD = pd.concat([AddCourseABCD, AddCourseS], ignore_index=True)
+            ABCDframes.append(AddCourseS)
 
     remaining_names = [c for g in Type for c in g if c not in listvisited]
-    AddCourseS_remaining = df[df['中文課名'].isin(remaining_names)].nlargest(1, '等級制')
-    AddCourseABCD = pd.concat([AddCourseABCD, AddCourseS_remaining], ignore_index=True)
+    ABCDframes.append(rows('name', remaining_names).nlargest(1, '等級制'))
+    AddCourseABCD = pd.concat(ABCDframes, ignore_index=True)
     AddCourseABCD = AddCourseABCD.nlargest(4, '等級制').reset_index(drop=True)
 
     return AllCoursesData, GEclassData, AddCourseABCD
@@ -94,127 +133,338 @@ def process_past_courses(past_courses_names, all_courses_df, cs_learn_df, ge_df)
     }
     if not past_courses_names:
         return initial_state
-    past_courses_info = all_courses_df[all_courses_df['中文課名'].isin(past_courses_names)].drop_duplicates(subset=['中文課名'])
-    
-    for _, course in past_courses_info.iterrows():
-        name, dept, code, credit = course['中文課名'], course['系所全名'], course['科號'], course['學分']
-        # 標記滿足的必修
-        if name in cs_learn_df['中文課名'].values: initial_state['fulfilled_reqs'].add(name)
-        if name in REVERSE_SUB_MAP: initial_state['fulfilled_reqs'].add(REVERSE_SUB_MAP[name])
-        # 計算通識
-        if name in ge_df['中文課名'].values: initial_state['ge_credits'] += credit
-    
-        target_prefixes = ['EE', 'CS', 'ISA', 'COM']
-        is_cs_required = name in cs_learn_df['中文課名'].values # 檢查是否為系上必修
-        if any(p in code for p in target_prefixes) and not is_cs_required:
-             initial_state['eecs_credits'] += credit
-        # 計算英文學分
-        if name in ENG_REQ_COURSES["前標"] or name in ENG_REQ_COURSES["頂標"]:
-            initial_state['eng_req_completed'] += 1
-            initial_state['fulfilled_reqs'].add(name)
-        elif dept in ['英語教育中心(110起)', '英語教育中心']:
-            initial_state['eng_elec_completed'] += 1
-        elif dept in FOREIGN_LANG_DEPTS:
-            initial_state['eng_elec_completed'] += 1
+    # 以課名索引取每個課名在課程表中的第一列 (與 isin 後 drop_duplicates 相同，但不需掃描整份課程表)
+    name_rows = get_catalog_index(all_courses_df)['name']
+    first_rows = sorted(name_rows[name][0] for name in set(past_courses_names) if name in name_rows)
+    past_courses_info = all_courses_df.iloc[first_rows]
+    names, depts, credits = past_courses_info['中文課名'], past_courses_info['系所全名'], past_courses_info['學分']
+
+    # 標記滿足的必修
+    is_cs_required = names.isin(set(cs_learn_df['中文課名'])) # 檢查是否為系上必修
+    is_eng_req = names.isin(ENG_REQ_COURSES["前標"] + ENG_REQ_COURSES["頂標"])
+    initial_state['fulfilled_reqs'].update(names[is_cs_required | is_eng_req])
+    initial_state['fulfilled_reqs'].update(REVERSE_SUB_MAP[name] for name in names if name in REVERSE_SUB_MAP)
+    # 計算通識與電資專業選修學分 (科號含 EE/CS/ISA/COM 的非系上必修)
+    def credit_sum(mask): return float(credits[mask].sum()) if mask.any() else 0
+    initial_state['ge_credits'] = credit_sum(names.isin(set(ge_df['中文課名'])))
+    target_prefixes = ['EE', 'CS', 'ISA', 'COM']
+    is_eecs = past_courses_info['科號'].astype(str).str.contains('|'.join(target_prefixes), regex=True) & ~is_cs_required
+    initial_state['eecs_credits'] = credit_sum(is_eecs)
+    # 計算英文學分
+    initial_state['eng_req_completed'] = int(is_eng_req.sum())
+    initial_state['eng_elec_completed'] = int((~is_eng_req & depts.isin(['英語教育中心(110起)', '英語教育中心'] + FOREIGN_LANG_DEPTS)).sum())
 
     initial_state['initial_result_df'] = past_courses_info
     return initial_state
 
-def get_recommended_schedule(settings, AllCoursesData, GEclassData, AddCourseABCD, cs_learn_df):
+def build_candidate_buckets(candidates):
+    """
+    將已排序的候選課程依 (科號年級, 開課學期別, 學分) 分桶，年級與學期別 0 表示任何學期皆可。
+    每桶為 [(排序位置, 列索引, 時段遮罩, 學分, 科號, 課名), ...]，維持原排序；時間格式錯誤的課程直接略過。
+    """
+    buckets = {}
+    for rank, (label, time_mask, point, code, name) in enumerate(zip(
+            candidates.index, candidates[MASK_COLUMN], candidates['學分'], candidates['科號'], candidates['中文課名'])):
+        if time_mask < 0: continue
+        point = int(point)
+        buckets.setdefault((course_year(code), course_term(code), point), []).append((rank, label, time_mask, point, code, name))
+    return buckets
+
+RECORD_COLUMNS = [MASK_COLUMN, '學分', '科號', '中文課名']
+
+def course_records(frame):
+    """
+    與 iterrows 相同逐列回傳 (列索引, 列)，但列只是含排課所需欄位 (RECORD_COLUMNS) 的 dict；
+    iterrows 需先把整張表 (含 category 欄位) 轉成 object 陣列再逐列建立 Series，排課迴圈中代價過高。
+    """
+    columns = [frame[col].tolist() for col in RECORD_COLUMNS]
+    return ((label, dict(zip(RECORD_COLUMNS, values))) for label, *values in zip(frame.index, *columns))
+
+def build_semester_frames(placements):
+    """依照各學期的 (來源表, 列索引) 紀錄建立課表 DataFrame"""
+    return [pd.DataFrame([source.loc[label] for source, label in entries]).reset_index(drop=True) if entries else pd.DataFrame()
+            for entries in placements]
+
+def build_requirement_groups(settings, AllCoursesData, GEclassData, AddCourseABCD, cs_learn_df, initial_state, scheduled_names, fulfilled_requirements):
+    """
+    列出搜尋引擎要滿足的需求群組 (與貪婪流程相同的想上課程、英文與資工系必修/專業選修)。
+    已由已修課程滿足的資工系需求會直接加入 fulfilled_requirements。
+    """
+    groups, planned = [], set(fulfilled_requirements)
+    def add(names, fulfills, **extra):
+        if all(f in planned for f in fulfills) and fulfills: return
+        planned.update(fulfills)
+        groups.append(dict(names=names, fulfills=fulfills, **extra))
+    ge_names = set(GEclassData['中文課名'])
+    for course_name in settings.get('wanted_courses') or []:
+        if course_name in scheduled_names: continue
+        add([course_name], [course_name] + ([REVERSE_SUB_MAP[course_name]] if course_name in REVERSE_SUB_MAP else []), ge=course_name in ge_names)
+    for course_name in ENG_REQ_COURSES[settings['english_level']]:
+        add([course_name], [course_name])
+    if settings['elec_eng_option'] == "請推薦2門「選修英文」":
+        elec_eng_df = AllCoursesData[AllCoursesData['系所全名'].isin(['英語教育中心(110起)', '英語教育中心'])]
+        pool_names = elec_eng_df[~elec_eng_df['中文課名'].isin(ENG_REQ_COURSES["前標"] + ENG_REQ_COURSES["頂標"])]['中文課名'].unique().tolist()
+    elif settings['elec_eng_option'] == "請用2門「外語課」代替":
+        pool_names = AllCoursesData[AllCoursesData['系所全名'].isin(FOREIGN_LANG_DEPTS)]['中文課名'].unique().tolist()
+    else: pool_names = []
+    if pool_names:
+        for _ in range(2 - initial_state['eng_elec_completed']): add(pool_names, [], pool='elec_eng')
+    for MustclassData in (cs_learn_df[cs_learn_df['類別']=='1'], cs_learn_df[cs_learn_df['類別']==settings['SelectCourse']], AddCourseABCD):
+        for course_name in MustclassData['中文課名']:
+            course_options = [course_name] + SUBSTITUTE_MAP.get(course_name, [])
+            if any(name in scheduled_names for name in course_options): fulfilled_requirements.add(course_name); continue
+            add(course_options, [course_name])
+    return groups
+
+def scheduled_sets(initial_state):
+    """已修課程的科號與課名集合"""
+    past_df = initial_state['initial_result_df']
+    if past_df.empty: return set(), set()
+    return set(past_df['科號']), set(past_df['中文課名'])
+
+GREEDY_PHASES = ['wanted', 'eng_req', 'eng_elec', 'cs_0', 'cs_1', 'cs_2', 'ge', 'eecs', 'fill']
+SEARCH_PHASES = ['requirements', 'ge', 'eecs', 'fill']
+# 會影響整個排課流程 (含已修課程分析) 的設定；改變時必須從頭重排
+RESTART_SETTINGS = ['completed_semesters', 'past_courses', 'SelectNumberList', 'english_level', 'wanted_courses']
+# 只影響某個階段之後的設定
+PHASE_SETTINGS = {'elec_eng_option': 'eng_elec', 'SelectCourse': 'cs_1'}
+
+
+def _resume_phase(prev, settings, AllCoursesData, GEclassData, AddCourseABCD, cs_learn_df):
+    """
+    比較上一次排課的檢查點與本次設定，回傳可以沿用到第幾個階段 (0 表示從頭排，len(GREEDY_PHASES) 表示整份結果可直接沿用)，
+    以及將上次排課紀錄對應到本次課程表的函式。
+    """
+    if prev is None or prev['cs_learn_df'] is not cs_learn_df: return 0, None
+    old = prev['settings']
+    if any(old.get(key) != settings.get(key) for key in RESTART_SETTINGS): return 0, None
+    resume = len(GREEDY_PHASES)
+    for key, phase in PHASE_SETTINGS.items():
+        if old.get(key) != settings.get(key): resume = min(resume, GREEDY_PHASES.index(phase))
+    if not (prev['AddCourseABCD'] is AddCourseABCD or prev['AddCourseABCD'].equals(AddCourseABCD)):
+        resume = min(resume, GREEDY_PHASES.index('cs_2'))
+
+    # 新增不想上的課程只會影響排入該課程的階段；移除 (重新開放) 課程則可能改變任何階段
+    old_unwanted, new_unwanted = set(old.get('unwanted_courses') or []), set(settings.get('unwanted_courses') or [])
+    if old_unwanted - new_unwanted or new_unwanted & set(settings.get('past_courses') or []): return 0, None
+    if old_unwanted == new_unwanted and prev['AllCoursesData'] is not AllCoursesData: return 0, None
+    placed_phase = prev['snapshots'][-1]['placed_phase']
+    for name in new_unwanted - old_unwanted:
+        if name in placed_phase: resume = min(resume, placed_phase[name])
+
+    # 學分上限只透過比較影響排課；檢查點之前所有比較在新上限下結果不變時才可沿用
+    CreditList = settings['CreditList']
+    while resume > 0 and not all(lo <= CreditList[sem] < hi for sem, (lo, hi) in enumerate(prev['snapshots'][resume]['cap_bounds'])):
+        resume -= 1
+    if resume == 0: return 0, None
+
+    # 課程表物件不同時 (不想上的課程改變)，依 (科號, 上課時間) 將排課紀錄對應到新的列索引
+    if prev['AllCoursesData'] is AllCoursesData and prev['GEclassData'] is GEclassData:
+        return resume, lambda source, label: (source, label)
+    new_labels = {key: label for label, key in zip(AllCoursesData.index, zip(AllCoursesData['科號'], AllCoursesData['上課時間']))}
+    old_all, old_ge = prev['AllCoursesData'], prev['GEclassData']
+    def remap(source, label):
+        if source is old_ge: return GEclassData, label
+        return AllCoursesData, new_labels[(old_all.at[label, '科號'], old_all.at[label, '上課時間'])]
+    return resume, remap
+
+def get_recommended_schedule(settings, AllCoursesData, GEclassData, AddCourseABCD, cs_learn_df, requirement_plan=None, checkpoints=None, profile=None):
     """
     核心排課演算法
+    requirement_plan 為 [(群組編號, 列位置, 學期), ...] 時，需求課程直接依此排入 (見 get_recommended_schedules)。
+    checkpoints 為呼叫端保存的 dict 時 (貪婪流程)，會在每個階段前記錄排課狀態，
+    下次呼叫時從第一個受設定變動影響的階段繼續排，而不必從頭重排。
+    profile 為 schedule_profile.new_profile() 時，記錄各階段耗時、嘗試排課次數與各原因的拒絕次數。
     """
     # 讀取新設定
     completed_semesters = settings.get('completed_semesters', 0)
-    past_courses_names = settings.get('past_courses', [])
+    past_courses_names = settings.get('past_courses') or []
     CreditList = settings['CreditList']
     
     # 在排課前先處理已修課程
-    initial_state = process_past_courses(past_courses_names, AllCoursesData, cs_learn_df, GEclassData)
+    with timed(profile, 'past_courses'):
+        initial_state = process_past_courses(past_courses_names, AllCoursesData, cs_learn_df, GEclassData)
     fulfilled_requirements = initial_state['fulfilled_reqs']
     GE_Credit = initial_state['ge_credits']
     selected_eecs_credit = initial_state['eecs_credits']
-    result_df = initial_state['initial_result_df']
-    
-    # 初始化
-    course_codes = np.full((8, 7, 13), None, dtype=object)
+    # 排課狀態：只記錄各學期排入課程的 (來源表, 列索引)，以及已排課程的科號與課名集合
+    scheduled_codes, scheduled_names = scheduled_sets(initial_state)
+
+    # 初始化 (每學期的佔用時段以位元遮罩表示)
+    occupied = [0] * 8
     credit = [0] * 8
-    course_list = [pd.DataFrame() for _ in range(8)]
-    
-    def is_conflict(semester, time_mapping):
-        return any(course_codes[semester, t[0], t[1]] is not None for t in time_mapping)
-
-    def try_schedule_course(course_df, semester):
-        time_str = str(course_df['上課時間'].iloc[0]).replace(',', '')
-        school_point = int(course_df['學分'].iloc[0])
-
-        time_mapping, is_valid_time = [], True
-        if len(time_str) % 2 != 0: is_valid_time = False
-        else:
-            for i in range(0, len(time_str), 2):
-                day, period = time_str[i], time_str[i+1]
-                if day not in WEEKDAY_MAPPING or period not in NUMBER_MAPPING: is_valid_time = False; break
-                time_mapping.append([WEEKDAY_MAPPING[day], NUMBER_MAPPING[period]])
-        if not is_valid_time:
-            # print(f"警告：課程 '{course_df['中文課名'].iloc[0]}' (科號: {course_df['科號'].iloc[0]}) 的上課時間 '{time_str}' 格式錯誤，跳過。")
+    placements = [[] for _ in range(8)]
+    # 各學期學分上限比較過的範圍 [通過的最大值, 未通過的最小值)，以及每門課在哪個階段排入
+    cap_bounds = [[float('-inf'), float('inf')] for _ in range(8)]
+    placed_phase, current_phase = {}, [0]
+    phase_stats = [None]  # 開啟 profile 時為目前階段的統計
+
+    # 各開課學期別 (course_term，0 表示不限) 可排入的學期；逐學期嘗試的階段只走訪這些學期，不必逐一排除非本學期開課
+    term_semesters = {term: [sem for sem in range(completed_semesters, 8) if term == 0 or term == (sem % 2) + 1] for term in (0, 1, 2)}
+
+    def cap_allows(semester, value):
+        allowed = value <= CreditList[semester]
+        bounds = cap_bounds[semester]
+        if allowed: bounds[0] = max(bounds[0], value)
+        else: bounds[1] = min(bounds[1], value)
+        return allowed
+
+    def try_schedule_course(label, row, semester, source=AllCoursesData):
+        return try_place(label, row[MASK_COLUMN], int(row['學分']), row['科號'], row['中文課名'], semester, source)
+
+    def try_place(label, time_mask, school_point, code, name, semester, source=AllCoursesData):
+        stats = phase_stats[0]
+        if stats is not None: stats['calls'] += 1; stats['candidate_ids'].add((id(source), label))
+        if time_mask < 0:
+            # print(f"警告：課程 '{name}' (科號: {code}) 的上課時間格式錯誤，跳過。")
+            if stats is not None: stats['rejected']['time_format'] += 1
+            return False
+        if not term_allowed(code, semester):
+            # 不在本學期開課時與學分上限無關，先排除，不必記錄學分比較
+            if stats is not None: stats['rejected']['term_mismatch'] += 1
+            return False
+        if not cap_allows(semester, credit[semester] + school_point):
+            if stats is not None: stats['rejected']['credit_cap'] += 1
+            return False
+        if occupied[semester] & time_mask:
+            if stats is not None: stats['rejected']['slot_conflict'] += 1
+            return False
+        if not year_allowed(code, semester):
+            if stats is not None: stats['rejected']['year_mismatch'] += 1
             return False
-        if (credit[semester] + school_point) > CreditList[semester] or is_conflict(semester, time_mapping): return False
-        try:
-            course_year = int(str(course_df['科號'].iloc[0])[-6])
-            if course_year > 0 and 'GEC' not in str(course_df['科號'].iloc[0]) and course_year != (semester // 2) + 1: return False
-        except (ValueError, IndexError): pass
-        for t in time_mapping: course_codes[semester, t[0], t[1]] = course_df['中文課名'].iloc[0]
+        if stats is not None: stats['placed'] += 1
+        occupied[semester] |= time_mask
         credit[semester] += school_point
-        course_list[semester] = pd.concat([course_list[semester], course_df], ignore_index=True)
+        placements[semester].append((source, label))
+        scheduled_codes.add(code); scheduled_names.add(name)
+        placed_phase.setdefault(name, current_phase[0])
         return True
 
-    def schedule_best_available(course_names, current_result_df):
-        if not current_result_df.empty and any(name in current_result_df['中文課名'].values for name in course_names): return True, current_result_df
-        temp_courses = AllCoursesData[AllCoursesData['中文課名'].isin(course_names)].sort_values(by='等級制', ascending=False)
-        for _, course_to_schedule in temp_courses.iterrows():
-            course_df = course_to_schedule.to_frame().T
-            for sem in range(completed_semesters, 8):
-                if try_schedule_course(course_df, sem):
-                    current_result_df = pd.concat([current_result_df, course_df], ignore_index=True)
-                    return True, current_result_df
-        print(f"警告：課程 '{course_names[0]}' (及其替代課程) 因衝堂或學分限制無法排入。")
-        return False, current_result_df
-        
+    def schedule_best_available(course_names):
+        if any(name in scheduled_names for name in course_names): return True, None
+        temp_courses = AllCoursesData[AllCoursesData['中文課名'].isin(course_names)].sort_values(by='等級制', ascending=False, kind='stable')
+        for label, course_to_schedule in course_records(temp_courses):
+            for sem in term_semesters[course_term(course_to_schedule['科號'])]:
+                if try_schedule_course(label, course_to_schedule, sem):
+                    return True, course_to_schedule
+        if course_names: warn_unscheduled(course_names[0])  # 課程表中沒有任何候選時 (如未載入外語課程) 不排課也不警告
+        return False, None
+
+    def warn_unscheduled(course_name):
+        print(f"警告：課程 '{course_name}' (及其替代課程) 因衝堂或學分限制無法排入。")
+        if profile is not None: profile['dropped'].append(course_name)
+
+    def snapshot():
+        return {
+            'occupied': list(occupied), 'credit': list(credit), 'placements': [list(p) for p in placements],
+            'codes': set(scheduled_codes), 'names': set(scheduled_names), 'fulfilled': set(fulfilled_requirements),
+            'ge_credit': GE_Credit, 'eecs_credit': selected_eecs_credit,
+            'cap_bounds': [tuple(b) for b in cap_bounds], 'placed_phase': dict(placed_phase),
+        }
+
+    def restore(snap, remap):
+        nonlocal GE_Credit, selected_eecs_credit
+        occupied[:], credit[:] = snap['occupied'], snap['credit']
+        placements[:] = [[remap(source, label) for source, label in p] for p in snap['placements']]
+        scheduled_codes.clear(); scheduled_codes.update(snap['codes'])
+        scheduled_names.clear(); scheduled_names.update(snap['names'])
+        fulfilled_requirements.clear(); fulfilled_requirements.update(snap['fulfilled'])
+        GE_Credit, selected_eecs_credit = snap['ge_credit'], snap['eecs_credit']
+        cap_bounds[:] = [list(b) for b in snap['cap_bounds']]
+        placed_phase.clear(); placed_phase.update(snap['placed_phase'])
+
     # --- 排課流程 ---
+    def phase_requirements():
+        groups = build_requirement_groups(settings, AllCoursesData, GEclassData, AddCourseABCD, cs_learn_df, initial_state, scheduled_names, fulfilled_requirements)
+        if requirement_plan is not None:
+            place_assignment(groups, requirement_plan)
+            return
+        # 以分支定界一次決定所有需求課程的學期，避免貪婪流程中早先的選擇擋住後面的必修
+        assignment, search_stats = branch_and_bound_schedule(
+            groups, AllCoursesData, CreditList, completed_semesters, credit, occupied,
+            scheduled_names=scheduled_names, time_limit=settings.get('search_time_limit', DEFAULT_SEARCH_TIME_LIMIT))
+        initial_state['search_stats'] = search_stats
+        if search_stats['complete']:
+            place_assignment(groups, assignment)
+            return
+        # 時間用完時搜尋結果可能不如貪婪流程：兩種排法都從目前狀態試一次，保留滿足較多需求的一方 (同樣多時用搜尋結果)
+        before, keep = snapshot(), lambda source, label: (source, label)
+        dropped = len(profile['dropped']) if profile is not None else 0
+        attempts = []
+        for run in (lambda: place_assignment(groups, assignment), phase_greedy_requirements):
+            restore(before, keep)
+            if profile is not None: del profile['dropped'][dropped:]
+            with redirect_stdout(io.StringIO()) as log:
+                run()
+            attempts.append((len(fulfilled_requirements), snapshot(), log.getvalue(), profile['dropped'][dropped:] if profile is not None else []))
+        _, state, output, dropped_names = max(attempts, key=lambda attempt: attempt[0])
+        restore(state, keep)
+        print(output, end='')
+        if profile is not None: profile['dropped'][dropped:] = dropped_names
+
+    def place_assignment(groups, assignment):
+        nonlocal GE_Credit
+        for g, pos, sem in assignment:
+            row = AllCoursesData.iloc[pos]
+            try_schedule_course(AllCoursesData.index[pos], row, sem)
+            fulfilled_requirements.update(groups[g]['fulfills'])
+            if groups[g].get('ge'): GE_Credit += int(row['學分'])
+        # 搜尋沒有排入的群組 (包含時間用完時還沒建立候選的群組) 再以貪婪方式逐門嘗試，不讓需求整個被放棄
+        placed_groups = {g for g, _, _ in assignment}
+        for g, group in enumerate(groups):
+            if g in placed_groups: continue
+            # 同一 pool 的群組共用課名清單，已排入的課名要先排除，否則會被當成已滿足
+            names = [name for name in group['names'] if name not in scheduled_names] if group.get('pool') else group['names']
+            if not names: continue
+            scheduled, row = schedule_best_available(names)
+            if not scheduled: continue
+            fulfilled_requirements.update(group['fulfills'])
+            if group.get('ge') and row is not None: GE_Credit += int(row['學分'])
+
+    def phase_greedy_requirements():
+        """與貪婪流程相同的需求課程排法 (想上的課程、英文、資工系必修與專業選修)"""
+        phase_wanted(); phase_eng_req(); phase_eng_elec()
+        for type_val in range(3): phase_cs(type_val)
+
     # 處理使用者想上的課程
-    if settings.get('wanted_courses', []):
-        for course_name in settings['wanted_courses']:
-            if course_name in fulfilled_requirements: continue
-            if not result_df.empty and course_name in result_df['中文課名'].values: continue
-            is_ge_course = not GEclassData[GEclassData['中文課名'] == course_name].empty
-            scheduled, result_df = schedule_best_available([course_name], result_df)
-            if scheduled:
-                if is_ge_course:GE_Credit+=int(result_df[result_df['中文課名']==course_name].iloc[-1]['學分'])
-                if course_name in REVERSE_SUB_MAP:fulfilled_requirements.add(REVERSE_SUB_MAP[course_name])
-                fulfilled_requirements.add(course_name)
+    def phase_wanted():
+        nonlocal GE_Credit
+        if settings.get('wanted_courses'):
+            for course_name in settings['wanted_courses']:
+                if course_name in fulfilled_requirements: continue
+                if course_name in scheduled_names: continue
+                is_ge_course = not GEclassData[GEclassData['中文課名'] == course_name].empty
+                scheduled, scheduled_row = schedule_best_available([course_name])
+                if scheduled:
+                    if is_ge_course:GE_Credit+=int(scheduled_row['學分'])
+                    if course_name in REVERSE_SUB_MAP:fulfilled_requirements.add(REVERSE_SUB_MAP[course_name])
+                    fulfilled_requirements.add(course_name)
 
     # 處理必修英文
-    required_eng_courses = ENG_REQ_COURSES[settings['english_level']]
-    for course_name in required_eng_courses:
-        if course_name not in fulfilled_requirements:
-            scheduled, result_df = schedule_best_available([course_name], result_df)
-            if scheduled: fulfilled_requirements.add(course_name)
+    def phase_eng_req():
+        required_eng_courses = ENG_REQ_COURSES[settings['english_level']]
+        for course_name in required_eng_courses:
+            if course_name not in fulfilled_requirements:
+                scheduled, _ = schedule_best_available([course_name])
+                if scheduled: fulfilled_requirements.add(course_name)
+
     # 處理選修英文/外語
-    courses_to_schedule = 2 - initial_state['eng_elec_completed']
-    if courses_to_schedule > 0:
-        if settings['elec_eng_option'] == "請推薦2門「選修英文」":
-            elec_eng_df = AllCoursesData[(AllCoursesData['系所全名'] == '英語教育中心(110起)') | (AllCoursesData['系所全名'] == '英語教育中心')]
-            elec_eng_df = elec_eng_df[~elec_eng_df['中文課名'].isin(ENG_REQ_COURSES["前標"]) & ~elec_eng_df['中文課名'].isin(ENG_REQ_COURSES["頂標"])]
-            for _ in range(courses_to_schedule):
-                scheduled, result_df = schedule_best_available(elec_eng_df['中文課名'].tolist(), result_df)
-
-        elif settings['elec_eng_option'] == "請用2門「外語課」代替":
-            foreign_lang_df = AllCoursesData[AllCoursesData['系所全名'].isin(FOREIGN_LANG_DEPTS)]
-            for _ in range(courses_to_schedule):
-                scheduled, result_df = schedule_best_available(foreign_lang_df['中文課名'].tolist(), result_df)
-    
+    def phase_eng_elec():
+        courses_to_schedule = 2 - initial_state['eng_elec_completed']
+        if courses_to_schedule > 0:
+            if settings['elec_eng_option'] == "請推薦2門「選修英文」":
+                elec_eng_df = AllCoursesData[(AllCoursesData['系所全名'] == '英語教育中心(110起)') | (AllCoursesData['系所全名'] == '英語教育中心')]
+                elec_eng_df = elec_eng_df[~elec_eng_df['中文課名'].isin(ENG_REQ_COURSES["前標"]) & ~elec_eng_df['中文課名'].isin(ENG_REQ_COURSES["頂標"])]
+                for _ in range(courses_to_schedule):
+                    scheduled, _ = schedule_best_available(elec_eng_df['中文課名'].tolist())
+
+            elif settings['elec_eng_option'] == "請用2門「外語課」代替":
+                foreign_lang_df = AllCoursesData[AllCoursesData['系所全名'].isin(FOREIGN_LANG_DEPTS)]
+                for _ in range(courses_to_schedule):
+                    scheduled, _ = schedule_best_available(foreign_lang_df['中文課名'].tolist())
+
     # 處理資工系必修及專業選修
-    for type_val in range(3):
+    def phase_cs(type_val):
         MustclassData=pd.DataFrame()
         if type_val==0:MustclassData=cs_learn_df[cs_learn_df['類別']=='1']
         elif type_val==1:MustclassData=cs_learn_df[cs_learn_df['類別']==settings['SelectCourse']]
@@ -223,55 +473,121 @@ def get_recommended_schedule(settings, AllCoursesData, GEclassData, AddCourseABC
             course_name=row['中文課名']
             if course_name in fulfilled_requirements:continue
             course_options=[course_name]+SUBSTITUTE_MAP.get(course_name,[])
-            scheduled,result_df=schedule_best_available(course_options,result_df)
+            scheduled,_=schedule_best_available(course_options)
             if scheduled:fulfilled_requirements.add(course_name)
 
     # 處理通識 (GE)
-    ge_courses = GEclassData[~GEclassData['科號'].isin(result_df['科號'])].sort_values(by='等級制', ascending=False)
-    for i in range(1, 5):
-        core_ge = ge_courses[ge_courses['通識分類'].str.contains(f'核心通識CoreGEcourses{i}', na=False)]
-        for _, row in core_ge.iterrows():
-            course_df, scheduled = row.to_frame().T, False
-            for sem in range(completed_semesters, 8):
-                if try_schedule_course(course_df, sem):
-                    GE_Credit += int(row['學分']); scheduled = True
-                    result_df = pd.concat([result_df, course_df.drop(columns=['通識分類'], errors='ignore')], ignore_index=True)
+    def phase_ge():
+        nonlocal GE_Credit
+        ge_courses = GEclassData[~GEclassData['科號'].isin(scheduled_codes)].sort_values(by='等級制', ascending=False, kind='stable')
+        for i in range(1, 5):
+            core_ge = ge_courses[ge_courses['通識分類'].str.contains(f'核心通識CoreGEcourses{i}', na=False)]
+            for label, row in course_records(core_ge):
+                scheduled = False
+                for sem in term_semesters[course_term(row['科號'])]:
+                    if try_schedule_course(label, row, sem, GEclassData):
+                        GE_Credit += int(row['學分']); scheduled = True
+                        break
+                if scheduled: break
+
+        remaining_ge = ge_courses[~ge_courses['通識分類'].str.contains('核心通識', na=False)]
+        for label, row in course_records(remaining_ge):
+            if GE_Credit >= 20: break
+            for sem in term_semesters[course_term(row['科號'])]:
+                if try_schedule_course(label, row, sem, GEclassData):
+                    GE_Credit += int(row['學分'])
+                    break
+
+    # 處理電資專業選修
+    def phase_eecs():
+        nonlocal selected_eecs_credit
+        elective_courses = AllCoursesData[~AllCoursesData['科號'].isin(scheduled_codes)]
+        target_prefixes = ['EE', 'CS', 'ISA', 'COM']
+        eecs_elective = elective_courses[elective_courses['科號'].str.contains('|'.join(target_prefixes), na=False)]
+        eecs_elective = eecs_elective[~eecs_elective['中文課名'].str.contains('專題|書報討論', na=False)].sort_values(by='等級制', ascending=False, kind='stable')
+        # selected_eecs_credit = 0
+        for label, row in course_records(eecs_elective):
+            if selected_eecs_credit >= 12: break
+            for sem in term_semesters[course_term(row['科號'])]:
+                if try_schedule_course(label, row, sem):
+                    selected_eecs_credit += int(row['學分'])
                     break
-            if scheduled: break
-    
-    remaining_ge = ge_courses[~ge_courses['通識分類'].str.contains('核心通識', na=False)]
-    for _, row in remaining_ge.iterrows():
-        if GE_Credit >= 20: break
-        course_df = row.to_frame().T
-        for sem in range(completed_semesters, 8):
-            if try_schedule_course(course_df, sem):
-                GE_Credit += int(row['學分'])
-                result_df = pd.concat([result_df, course_df.drop(columns=['通識分類'], errors='ignore')], ignore_index=True)
-                break
 
     # 處理選修並補滿學分
-    elective_courses = AllCoursesData[~AllCoursesData['科號'].isin(result_df['科號'])]
-    target_prefixes = ['EE', 'CS', 'ISA', 'COM']
-    eecs_elective = elective_courses[elective_courses['科號'].str.contains('|'.join(target_prefixes), na=False)]
-    eecs_elective = eecs_elective[~eecs_elective['中文課名'].str.contains('專題|書報討論', na=False)].sort_values(by='等級制', ascending=False)
-    # selected_eecs_credit = 0
-    for _, row in eecs_elective.iterrows():
-        if selected_eecs_credit >= 12: break
-        course_df = row.to_frame().T
+    def phase_fill():
+        # 候選課程依 (年級, 開課學期別, 學分) 分桶，每桶維持等級制排序，每學期只合併該年級、該學期別開設的桶；
+        # 同一學期內被拒絕的課程之後也不可能排入 (學分與時段只會增加)，因此每桶只需一個往後移動的指標，並以 heap 依原排序合併各桶
+        other_elective = AllCoursesData[~AllCoursesData['科號'].isin(scheduled_codes)].sort_values(by='等級制', ascending=False, kind='stable')
+        buckets = build_candidate_buckets(other_elective)
         for sem in range(completed_semesters, 8):
-            if try_schedule_course(course_df, sem):
-                selected_eecs_credit += int(row['學分'])
-                result_df = pd.concat([result_df, course_df], ignore_index=True)
-                break
-    other_elective = elective_courses[~elective_courses['科號'].isin(result_df['科號'])].sort_values(by='等級制', ascending=False)
-    for sem in range(completed_semesters, 8):
-        while credit[sem] < CreditList[sem]:
-            scheduled_in_sem = False
-            for _, row in other_elective.iterrows():
-                if not result_df.empty and row['科號'] in result_df['科號'].values: continue
-                if try_schedule_course(row.to_frame().T, sem):
-                     result_df = pd.concat([result_df, row.to_frame().T], ignore_index=True); scheduled_in_sem = True; break
-            if not scheduled_in_sem: break
-    
+            year, term = (sem // 2) + 1, (sem % 2) + 1
+            heap = [(bucket[0][0], key, 0) for key, bucket in buckets.items() if key[0] in (0, year) and key[1] in (0, term)]
+            heapq.heapify(heap)
+            while cap_allows(sem, credit[sem] + 1):  # 即 credit[sem] < CreditList[sem]
+                scheduled_in_sem = False
+                while heap:
+                    _, key, i = heap[0]
+                    rank, label, time_mask, school_point, code, name = buckets[key][i]
+                    if code not in scheduled_codes and not cap_allows(sem, credit[sem] + school_point):
+                        heapq.heappop(heap)  # 這個學分數的課程在本學期都放不下了
+                        continue
+                    if i + 1 < len(buckets[key]): heapq.heapreplace(heap, (buckets[key][i + 1][0], key, i + 1))
+                    else: heapq.heappop(heap)
+                    if code in scheduled_codes: continue
+                    if try_place(label, time_mask, school_point, code, name, sem):
+                        scheduled_in_sem = True; break
+                if not scheduled_in_sem: break
+
+    tail_phases = [phase_ge, phase_eecs, phase_fill]
+    use_checkpoints = checkpoints is not None and requirement_plan is None and settings.get('scheduler') != 'search'
+    if requirement_plan is not None or settings.get('scheduler') == 'search':
+        phases, phase_names = [phase_requirements] + tail_phases, SEARCH_PHASES
+    else:
+        phases, phase_names = [phase_wanted, phase_eng_req, phase_eng_elec, partial(phase_cs, 0), partial(phase_cs, 1), partial(phase_cs, 2)] + tail_phases, GREEDY_PHASES
+
+    resume, snapshots = 0, []
+    if use_checkpoints:
+        resume, remap = _resume_phase(checkpoints.get('run'), settings, AllCoursesData, GEclassData, AddCourseABCD, cs_learn_df)
+        if resume > 0:
+            previous = checkpoints['run']['snapshots']
+            restore(previous[resume], remap)
+            snapshots = [dict(snap, placements=[[remap(source, label) for source, label in p] for p in snap['placements']]) for snap in previous[:resume]]
+        checkpoints['resumed_from'] = GREEDY_PHASES[resume] if resume < len(GREEDY_PHASES) else 'done'
+        if profile is not None: profile['resumed_from'] = checkpoints['resumed_from']
+    for index in range(resume, len(phases)):
+        if use_checkpoints: snapshots.append(snapshot())
+        current_phase[0] = index
+        if profile is None:
+            phases[index]()
+            continue
+        stats = phase_stats[0] = profile['phases'][phase_names[index]] = new_phase_stats()
+        start = time.perf_counter()
+        phases[index]()
+        stats['seconds'] = time.perf_counter() - start
+        stats['candidates'] = len(stats.pop('candidate_ids'))
+        phase_stats[0] = None
+    if use_checkpoints:
+        snapshots.append(snapshot())
+        checkpoints['run'] = {
+            'settings': {key: copy.deepcopy(settings.get(key)) for key in RESTART_SETTINGS + list(PHASE_SETTINGS) + ['unwanted_courses']},
+            'AllCoursesData': AllCoursesData, 'GEclassData': GEclassData, 'AddCourseABCD': AddCourseABCD, 'cs_learn_df': cs_learn_df,
+            'snapshots': snapshots,
+        }
+
+    # 排課結束後才一次建立各學期的 DataFrame
+    course_list = build_semester_frames(placements)
     total_credits = sum(credit)
-    return course_list, credit, total_credits, initial_state
\ No newline at end of file
+    return course_list, credit, total_credits, initial_state
+
+def get_recommended_schedules(settings, AllCoursesData, GEclassData, AddCourseABCD, cs_learn_df, k=5, beam_width=DEFAULT_BEAM_WIDTH):
+    """
+    一次產生最多 k 份不同的推薦課表。
+    需求課程以束搜尋 (beam search) 找出 k 種最佳排法，各部分解共用前綴；其餘通識與選修依一般流程補滿。
+    回傳 [(course_list, credit, total_credits, initial_state), ...]，依需求滿足數與等級制排序。
+    """
+    initial_state = process_past_courses(settings.get('past_courses') or [], AllCoursesData, cs_learn_df, GEclassData)
+    _, scheduled_names = scheduled_sets(initial_state)
+    groups = build_requirement_groups(settings, AllCoursesData, GEclassData, AddCourseABCD, cs_learn_df, initial_state, scheduled_names, set(initial_state['fulfilled_reqs']))
+    plans = beam_search_schedules(groups, AllCoursesData, settings['CreditList'], settings.get('completed_semesters', 0), [0] * 8, [0] * 8,
+                                  scheduled_names=scheduled_names, k=k, beam_width=beam_width)
+    return [get_recommended_schedule(settings, AllCoursesData, GEclassData, AddCourseABCD, cs_learn_df, requirement_plan=plan) for plan in plans]
@@ -0,0 +1,154 @@
+import time
+from catalog import MASK_COLUMN, allowed_semesters
+
+DEFAULT_SEARCH_TIME_LIMIT = 3.0  # 秒
+DEFAULT_BEAM_WIDTH = 20
+_TIME_CHECK_INTERVAL = 256  # 每展開幾個節點檢查一次時間
+
+
+class _SearchTimeout(Exception):
+    pass
+
+
+def build_candidates(groups, AllCoursesData, CreditList, completed_semesters, credit, occupied, deadline=None):
+    """
+    為每個需求群組列出所有可行的 (等級制, 學期, 列位置, 時段遮罩, 學分, 課名)。
+    已先套用學分上限、科號年級與學期規則以及目前已佔用的時段；依等級制高、學期早排序。
+    超過 deadline (time.monotonic() 時間) 時停止建立，尚未處理的群組視為沒有選項。
+    """
+    names = AllCoursesData['中文課名'].to_numpy()
+    codes = AllCoursesData['科號'].to_numpy()
+    masks = AllCoursesData[MASK_COLUMN].to_numpy()
+    points = AllCoursesData['學分'].to_numpy()
+    grades = AllCoursesData['等級制'].to_numpy()
+    by_name = AllCoursesData.groupby('中文課名', sort=False, observed=True).indices
+
+    domains = []
+    for group in groups:
+        if deadline is not None and time.monotonic() > deadline:
+            domains.append([])
+            continue
+        domain = []
+        for name in group['names']:
+            for pos in by_name.get(name, []):
+                mask, point = masks[pos], int(points[pos])
+                if mask < 0: continue
+                for sem in allowed_semesters(codes[pos]):
+                    if sem < completed_semesters or credit[sem] + point > CreditList[sem] or occupied[sem] & mask: continue
+                    domain.append((float(grades[pos]), sem, int(pos), mask, point, names[pos]))
+        domain.sort(key=lambda c: (-c[0], c[1], c[2]))
+        domains.append(domain)
+    return domains
+
+
+def branch_and_bound_schedule(groups, AllCoursesData, CreditList, completed_semesters, credit, occupied,
+                              scheduled_names=(), time_limit=DEFAULT_SEARCH_TIME_LIMIT):
+    """
+    以分支定界搜尋需求群組的排法：先最大化可滿足的群組數，再最大化等級制總和。
+    每個群組至多選一門課、同一課名 (含 scheduled_names) 不重複選取；同一 pool 的群組 (如 2 門選修英文) 可互換，依列位置遞增選取以消除對稱。
+    time_limit 秒的時間預算包含建立候選的時間，超過即停止並回傳目前找到的最佳解。
+    回傳 (assignment, stats)，assignment 為 [(群組編號, 列位置, 學期), ...]。
+    """
+    deadline = time.monotonic() + time_limit
+    domains = build_candidates(groups, AllCoursesData, CreditList, completed_semesters, credit, occupied, deadline)
+    occupied, credit = list(occupied), list(credit)
+    used_names, pool_last, chosen = set(scheduled_names), {}, []
+    best = {'score': (-1, 0.0), 'assignment': []}
+    stats = {'nodes': 0, 'complete': False}
+    # 建立候選時已用完時間 (之後的群組沒有選項)：搜尋仍會在下一次檢查時間前找到第一個完整排法
+    out_of_time = time.monotonic() > deadline
+
+    def live(g):
+        pool = groups[g].get('pool')
+        floor = pool_last.get(pool, -1) if pool is not None else -1
+        return [c for c in domains[g]
+                if c[2] > floor and c[5] not in used_names
+                and credit[c[1]] + c[4] <= CreditList[c[1]] and not occupied[c[1]] & c[3]]
+
+    def dfs(remaining, count, grade):
+        stats['nodes'] += 1
+        if stats['nodes'] % _TIME_CHECK_INTERVAL == 0 and time.monotonic() > deadline: raise _SearchTimeout
+        # 約束傳播：計算各群組目前仍可行的選項，沒有選項的群組直接視為無法滿足
+        live_domains = [(g, live(g)) for g in remaining]
+        live_domains = [(g, d) for g, d in live_domains if d]
+        bound = (count + len(live_domains), grade + sum(d[0][0] for _, d in live_domains))
+        if bound <= best['score']: return
+        if not live_domains:
+            best['score'], best['assignment'] = (count, grade), list(chosen)
+            return
+        # 選項最少的群組優先分支
+        g, domain = min(live_domains, key=lambda item: len(item[1]))
+        rest = [other for other, _ in live_domains if other != g]
+        pool = groups[g].get('pool')
+        for cand in domain:
+            cand_grade, sem, pos, mask, point, name = cand
+            occupied[sem] |= mask; credit[sem] += point; used_names.add(name)
+            prev_last = pool_last.get(pool)
+            if pool is not None: pool_last[pool] = pos
+            chosen.append((g, pos, sem))
+            dfs(rest, count + 1, grade + cand_grade)
+            chosen.pop()
+            if pool is not None:
+                if prev_last is None: pool_last.pop(pool)
+                else: pool_last[pool] = prev_last
+            used_names.discard(name); credit[sem] -= point; occupied[sem] &= ~mask
+        # 也考慮放棄這個群組
+        dfs(rest, count, grade)
+
+    try:
+        dfs(list(range(len(groups))), 0, 0.0)
+        stats['complete'] = not out_of_time
+    except _SearchTimeout:
+        pass
+    stats['satisfied'], stats['grade'] = best['score'][0], best['score'][1]
+    return best['assignment'], stats
+
+
+def beam_search_schedules(groups, AllCoursesData, CreditList, completed_semesters, credit, occupied,
+                          scheduled_names=(), k=5, beam_width=DEFAULT_BEAM_WIDTH):
+    """
+    以束搜尋找出 k 種不同的需求群組排法，評分方式與 branch_and_bound_schedule 相同。
+    群組依選項數由少到多依序展開，每層只保留 beam_width 個最佳部分解；
+    部分解的時段與學分狀態為 tuple，已選課程以共用前綴的鏈結串列保存，展開時不需複製整份排法。
+    回傳 [assignment, ...]，assignment 格式同 branch_and_bound_schedule。
+    """
+    domains = build_candidates(groups, AllCoursesData, CreditList, completed_semesters, credit, occupied)
+    order = sorted(range(len(groups)), key=lambda g: len(domains[g]))
+    # 部分解: (評分, 各學期時段, 各學期學分, 已選課名, pool 已選到的列位置, 已選課程鏈結, 排法簽章)
+    beam = [((0, 0.0), tuple(occupied), tuple(credit), frozenset(scheduled_names), {}, None, frozenset())]
+    for g in order:
+        pool = groups[g].get('pool')
+        expanded = []
+        for (count, grade), occ, cred, used, pool_last, chain, signature in beam:
+            floor = pool_last.get(pool, -1) if pool is not None else -1
+            options = 0
+            for cand_grade, sem, pos, mask, point, name in domains[g]:
+                if pos <= floor or name in used or cred[sem] + point > CreditList[sem] or occ[sem] & mask: continue
+                expanded.append((
+                    (count + 1, grade + cand_grade),
+                    occ[:sem] + (occ[sem] | mask,) + occ[sem+1:],
+                    cred[:sem] + (cred[sem] + point,) + cred[sem+1:],
+                    used | {name},
+                    dict(pool_last, **{pool: pos}) if pool is not None else pool_last,
+                    (g, pos, sem, chain),
+                    signature | {(pos, sem)},
+                ))
+                options += 1
+                if options >= beam_width: break  # 選項已依等級制排序，之後的選項不會進入 beam
+            # 放棄這個群組
+            expanded.append(((count, grade), occ, cred, used, pool_last, chain, signature))
+        expanded.sort(key=lambda state: state[0], reverse=True)
+        beam, seen = [], set()
+        for state in expanded:
+            if state[6] in seen: continue
+            seen.add(state[6]); beam.append(state)
+            if len(beam) >= max(beam_width, k): break
+
+    plans = []
+    for state in beam[:k]:
+        assignment, chain = [], state[5]
+        while chain is not None:
+            g, pos, sem, chain = chain
+            assignment.append((g, pos, sem))
+        plans.append(assignment[::-1])
+    return plans
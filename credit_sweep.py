@@ -0,0 +1,67 @@
+import sys
+from contextlib import redirect_stdout
+import pandas as pd
+from course_logic import get_recommended_schedule
+from shared_data import set_shared, get_shared, shared_pool
+
+
+def schedule_grade_summary(course_lists):
+    """回傳 (課程數, 依學分加權的平均等級制)；沒有等級制資料 (NaN 或 0) 的課程不計入平均"""
+    frames = [df for df in course_lists if not df.empty]
+    if not frames: return 0, 0.0
+    courses = pd.concat(frames, ignore_index=True)
+    grades = pd.to_numeric(courses['等級制'], errors='coerce')
+    points = pd.to_numeric(courses['學分'], errors='coerce')
+    graded = grades > 0
+    weight = points[graded].sum()
+    return len(courses), float((grades[graded] * points[graded]).sum() / weight) if weight else 0.0
+
+
+def pareto_mask(table, columns):
+    """標記在 columns 上 (皆為越大越好) 不被其他方案支配的列"""
+    values = table[columns].to_numpy()
+    return [not any((other >= row).all() and (other > row).any() for other in values) for row in values]
+
+
+def _run_plan(index):
+    settings, frames, base_run = get_shared('sweep')
+    credit_list = settings['credit_plans'][index]
+    plan_settings = dict(settings, CreditList=list(credit_list))
+    # 基準排課沒有留下檢查點時 (搜尋排課不記錄檢查點)，每個方案都完整重排
+    checkpoints = {'run': base_run} if base_run is not None else None
+    with redirect_stdout(sys.stderr):
+        course_lists, credits, total_credits, initial_state = get_recommended_schedule(plan_settings, *frames, checkpoints=checkpoints)
+    course_count, avg_grade = schedule_grade_summary(course_lists)
+    return {
+        '方案': index + 1, 'CreditList': ' '.join(str(c) for c in credit_list),
+        '總學分': int(total_credits), '各學期學分': ' '.join(str(int(c)) for c in credits),
+        '課程數': course_count, '平均等級制': round(avg_grade, 3),
+        '已滿足需求': len(initial_state['fulfilled_reqs']), '從此階段分岔': checkpoints['resumed_from'] if checkpoints else '-',
+    }
+
+
+def sweep_credit_plans(settings, AllCoursesData, GEclassData, AddCourseABCD, cs_learn_df, credit_plans, workers=1):
+    """
+    比較同一位學生在多組 CreditList 下的推薦課表。
+    先以第一組學分排一次並記錄各階段檢查點，其餘方案只從學分上限開始影響結果的階段分岔重排
+    (搜尋排課不使用檢查點，各方案完整排課)；    workers > 1 時各方案以多行程平行計算。
+    回傳 (比較表, 柏拉圖最適方案)，以總學分與平均等級制皆越高越好判斷支配關係。
+    """
+    frames = (AllCoursesData, GEclassData, AddCourseABCD, cs_learn_df)
+    base_checkpoints = {}
+    if settings.get('scheduler') != 'search':
+        with redirect_stdout(sys.stderr):
+            get_recommended_schedule(dict(settings, CreditList=list(credit_plans[0])), *frames, checkpoints=base_checkpoints)
+    data = (dict(settings, credit_plans=[list(p) for p in credit_plans]), frames, base_checkpoints.get('run'))
+    # 排課資料與共同前綴檢查點只在每個 worker 啟動時共用一次，不隨每個方案重複傳送
+    set_shared('sweep', data)
+    if workers and workers > 1 and len(credit_plans) > 1:
+        with shared_pool('sweep', workers) as executor:
+            rows = list(executor.map(_run_plan, range(len(credit_plans))))
+    else:
+        rows = [_run_plan(i) for i in range(len(credit_plans))]
+    set_shared('sweep', None)
+
+    table = pd.DataFrame(rows)
+    table['柏拉圖最適'] = pareto_mask(table, ['總學分', '平均等級制'])
+    return table, table[table['柏拉圖最適']].reset_index(drop=True)
@@ -0,0 +1,104 @@
+import io
+import sys
+import argparse
+import numpy as np
+import pandas as pd
+from catalog import SOURCE_CSV, CATALOG_DIR, CATALOG_VERSION, open_catalog, build_catalog, append_catalog, _source_signature
+
+# 成績分布檔 (如 data/11110_1.csv) 中除科號外的欄位，與 all_done.csv 最後幾欄相同
+GRADE_COLUMNS = ['科目名稱 Course Name', '授課教師 Teacher', '修課人數 Enrollment', '等級制', '等級制.1', '百分制', '百分制.1']
+CHUNK_ROWS = 2000
+
+
+def term_of(codes):
+    """科號前 5 碼為學年期 (如 11110 為 111 學年度上學期)"""
+    return codes.str[:5]
+
+
+def course_key(codes):
+    """科號去掉學年期後的部分，用來對應不同學年期開設的同一門課"""
+    return codes.str[5:]
+
+
+def read_grade_file(path):
+    """讀取單一學期的成績分布檔，回傳以科號為索引的 DataFrame；原始檔的第二列是重複的中英文標題列，直接略過"""
+    # 全部以字串讀入，寫回 CSV 時維持原始格式 (如修課人數不會變成 36.0)
+    grades = pd.read_csv(path, encoding='utf-8-sig', dtype=str)
+    grades = grades[grades['科號'] != '科號']
+    return grades.drop_duplicates(subset=['科號'], keep='last').set_index('科號')
+
+
+def grade_history(arrays, meta):
+    """由已編譯的目錄計算每門課 (course_key) 的歷年等級制：先在各學年期內平均，再平均各學年期"""
+    codes = pd.Series(np.array(meta['categories']['科號'] + [''], dtype=object)[arrays['科號']])
+    graded = pd.DataFrame({'key': course_key(codes), 'term': term_of(codes), 'grade': np.asarray(arrays['等級制'])}).dropna(subset=['grade'])
+    return graded.groupby(['key', 'term'])['grade'].mean().groupby(level='key').mean()
+
+
+def merge_semester(catalog_chunk, grades, history, columns):
+    """將一批開課資料與成績以科號合併；沒有本學期成績的課程，以同一門課歷年平均的等級制補上"""
+    merged = catalog_chunk.drop(columns=[c for c in GRADE_COLUMNS if c in catalog_chunk.columns])
+    if grades is not None:
+        merged = merged.join(grades[GRADE_COLUMNS], on='科號')
+    merged = merged.reindex(columns=columns)
+    missing = merged['等級制'].isna()
+    merged['等級制'] = merged['等級制'].astype(object)
+    merged.loc[missing, '等級制'] = course_key(merged.loc[missing, '科號']).map(history).round(2)
+    return merged, int((missing & merged['等級制'].notna()).sum())
+
+
+def ingest_semester(catalog_path, grades_path=None, source_csv=SOURCE_CSV, catalog_dir=CATALOG_DIR):
+    """
+    將新學期的開課資料 (與 all_done.csv 前段欄位相同) 與成績分布檔合併後附加到 source_csv，並增量更新已編譯的目錄。
+    開課資料分批讀取；已收錄的學年期不可重複加入。回傳 (新增列數, 以歷年平均補上等級制的列數, 學年期)。
+    """
+    arrays, meta = open_catalog(catalog_dir)
+    if meta is None or meta.get('version') != CATALOG_VERSION or meta.get('source') != _source_signature(source_csv):
+        arrays, meta = build_catalog(source_csv, catalog_dir)
+    known_terms = set(term_of(pd.Series(meta['categories']['科號'], dtype=object)))
+    columns = pd.read_csv(source_csv, nrows=0).columns.tolist()
+    grades = read_grade_file(grades_path) if grades_path else None
+    history = grade_history(arrays, meta)
+
+    chunks, filled, terms = [], 0, set()
+    for chunk in pd.read_csv(catalog_path, encoding='utf-8-sig', dtype=str, chunksize=CHUNK_ROWS):
+        chunk = chunk.dropna(subset=['科號'])
+        terms |= set(term_of(chunk['科號']))
+        merged, count = merge_semester(chunk, grades, history, columns)
+        chunks.append(merged); filled += count
+    if terms & known_terms:
+        raise ValueError(f"學年期 {', '.join(sorted(terms & known_terms))} 已收錄在 {source_csv}")
+    if not chunks:
+        return 0, 0, []
+
+    # 先轉成 CSV 文字再讀回，讓併入目錄的值與日後從 CSV 完整重建時完全相同
+    text = pd.concat(chunks, ignore_index=True).to_csv(index=False, lineterminator='\r\n')
+    new_rows = pd.read_csv(io.StringIO(text))
+    with open(source_csv, 'a', encoding='utf-8', newline='') as f:
+        f.write(text.split('\r\n', 1)[1])
+    append_catalog(arrays, meta, new_rows, source_csv, catalog_dir)
+    return len(new_rows), filled, sorted(terms)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="清大課程推薦系統 - 加入新學期的開課與成績資料")
+    parser.add_argument('--catalog', required=True,
+                        help="新學期的開課資料 CSV (欄位同 all_done.csv 的開課欄位，需含科號)")
+    parser.add_argument('--grades',
+                        help="同學期的成績分布 CSV (如 data/11110_1.csv)；省略時以歷年平均等級制補上")
+    parser.add_argument('--source', default=SOURCE_CSV,
+                        help=f"要更新的合併課程表 (預設: {SOURCE_CSV})")
+    parser.add_argument('--catalog-dir', default=CATALOG_DIR,
+                        help=f"已編譯目錄的位置 (預設: {CATALOG_DIR})")
+    args = parser.parse_args()
+
+    try:
+        rows, filled, terms = ingest_semester(args.catalog, args.grades, args.source, args.catalog_dir)
+    except ValueError as e:
+        print(f"無法加入: {e}", file=sys.stderr)
+        sys.exit(1)
+    print(f"已加入學年期 {', '.join(terms) or '-'} 共 {rows} 筆課程至 {args.source}，其中 {filled} 筆以歷年平均等級制補上")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+import time
+from contextlib import contextmanager
+import pandas as pd
+
+REJECT_REASONS = {'time_format': '時間格式錯誤', 'term_mismatch': '非本學期開課', 'credit_cap': '超過學分上限',
+                  'slot_conflict': '衝堂', 'year_mismatch': '年級不符'}
+
+
+def new_profile():
+    """建立排課統計；傳給 get_recommended_schedule(profile=...) 才會計數，未傳入時不產生額外成本"""
+    return {'phases': {}, 'timings': {}, 'dropped': [], 'resumed_from': None}
+
+
+def new_phase_stats():
+    return {'seconds': 0.0, 'calls': 0, 'placed': 0, 'candidates': 0, 'candidate_ids': set(),
+            'rejected': dict.fromkeys(REJECT_REASONS, 0)}
+
+
+@contextmanager
+def timed(profile, name):
+    """以 with timed(profile, 'load_data'): 記錄排課流程外的步驟耗時；profile 為 None 時不做任何事"""
+    start = time.perf_counter()
+    yield
+    if profile is not None:
+        profile['timings'][name] = profile['timings'].get(name, 0.0) + time.perf_counter() - start
+
+
+def profile_table(profile):
+    """各階段統計表：耗時、嘗試排課次數、檢查過的候選課程數、排入數與各拒絕原因次數"""
+    rows = []
+    for name, seconds in profile['timings'].items():
+        rows.append({'階段': name, '耗時(ms)': round(seconds * 1000, 2)})
+    for name, stats in profile['phases'].items():
+        row = {'階段': name, '耗時(ms)': round(stats['seconds'] * 1000, 2), '嘗試次數': stats['calls'],
+               '候選課程': stats['candidates'], '排入': stats['placed']}
+        row.update({label: stats['rejected'][reason] for reason, label in REJECT_REASONS.items()})
+        rows.append(row)
+    return pd.DataFrame(rows, dtype=object).fillna('')
+
+
+def profile_to_json(profile):
+    return {
+        'timings': profile['timings'], 'resumed_from': profile['resumed_from'], 'dropped': profile['dropped'],
+        'phases': profile['phases'],
+    }
+
+
+def format_profile(profile):
+    lines = ["==================== 排課統計 ====================", profile_table(profile).to_string(index=False)]
+    if profile['resumed_from']: lines.append(f"從檢查點續排的階段: {profile['resumed_from']}")
+    if profile['dropped']: lines.append("無法排入的課程: " + "、".join(profile['dropped']))
+    return "\n".join(lines)
@@ -0,0 +1,282 @@
+import sys
+import json
+import asyncio
+import argparse
+import urllib.request
+from collections import OrderedDict
+from contextlib import redirect_stdout
+import pandas as pd
+from course_logic import ENG_REQ_COURSES, ELEC_ENG_OPTIONS, load_data, get_prepared_courses_and_settings, get_recommended_schedule, get_recommended_schedules, process_past_courses
+from course_index import DEFAULT_LIMIT, get_search_index, search_courses
+from catalog import SOURCE_CSV, DETAIL_COLUMNS, load_course_details
+from shared_data import set_shared, get_shared, shared_pool
+
+SEMESTERS = ["大一上", "大一下", "大二上", "大二下", "大三上", "大三下", "大四上", "大四下"]
+OUTPUT_COLUMNS = ['科號', '中文課名', '學分', '教師', '上課時間']
+STATE_FIELDS = ['eng_req_completed', 'eng_elec_completed', 'ge_credits', 'eecs_credits']
+REQUIRED_SETTINGS = ['CreditList', 'SelectNumberList', 'SelectType', 'SelectCourse', 'english_level', 'elec_eng_option']
+DEFAULT_HOST, DEFAULT_PORT = '127.0.0.1', 8765
+RESPONSE_CACHE_SIZE = 256
+MAX_BODY_BYTES = 1 << 20
+
+# 未指定時與指定預設值結果相同的設定，正規化時補上，讓兩者共用同一個快取項目
+SETTING_DEFAULTS = {'completed_semesters': 0, 'past_courses': [], 'wanted_courses': [], 'unwanted_courses': [], 'scheduler': 'greedy'}
+# 順序不影響結果的清單設定 (wanted_courses 的順序即優先順序，不可排序)
+UNORDERED_SETTINGS = ['past_courses', 'unwanted_courses', 'SelectNumberList', 'EnglishNameList']
+
+
+def schedule_to_record(course_lists, credits, total_credits, initial_state=None):
+    """將排課結果轉為可輸出成 JSON 的 dict；傳入 initial_state 時一併附上已修課程的統計"""
+    semesters = []
+    for i, sem in enumerate(SEMESTERS):
+        courses = course_lists[i][OUTPUT_COLUMNS].to_dict('records') if not course_lists[i].empty else []
+        semesters.append({'semester': sem, 'credits': int(credits[i]), 'courses': courses})
+    record = {'total_credits': int(total_credits), 'semesters': semesters}
+    if initial_state is not None: record['state'] = state_to_record(initial_state)
+    return record
+
+
+def state_to_record(initial_state):
+    return dict({'fulfilled_reqs': sorted(initial_state['fulfilled_reqs'])}, **{k: initial_state[k] for k in STATE_FIELDS})
+
+
+def record_to_schedule(record):
+    """schedule_to_record 的反向轉換，回傳與 get_recommended_schedule 相同格式的 (course_list, credit, total_credits, initial_state)"""
+    course_lists = [pd.DataFrame(sem['courses'], columns=OUTPUT_COLUMNS) if sem['courses'] else pd.DataFrame() for sem in record['semesters']]
+    credits = [sem['credits'] for sem in record['semesters']]
+    return course_lists, credits, record['total_credits'], record.get('state', {})
+
+
+def normalize_settings(settings):
+    """補上預設值並排序與順序無關的清單，回傳可作為快取鍵的 JSON 字串"""
+    settings = dict(SETTING_DEFAULTS, **{k: v for k, v in settings.items() if v is not None})
+    for key in UNORDERED_SETTINGS:
+        if key in settings: settings[key] = sorted(set(settings[key]))
+    return json.dumps(settings, ensure_ascii=False, sort_keys=True)
+
+
+def _schedule_job(settings, k):
+    """在 worker 行程中排課，回傳 [record, ...]"""
+    all_courses_df, cs_learn_df = get_shared('course_data')
+    with redirect_stdout(sys.stderr):
+        AllCoursesData, GEclassData, AddCourseABCD = get_prepared_courses_and_settings(all_courses_df, settings)
+        if k > 1:
+            results = get_recommended_schedules(settings, AllCoursesData, GEclassData, AddCourseABCD, cs_learn_df, k=k)
+        else:
+            results = [get_recommended_schedule(settings, AllCoursesData, GEclassData, AddCourseABCD, cs_learn_df)]
+    return [schedule_to_record(*result) for result in results]
+
+
+def create_service(workers=None, cache_size=RESPONSE_CACHE_SIZE):
+    """載入課程資料並建立排課 worker pool；回傳服務狀態 dict"""
+    course_data = load_data()
+    all_courses_df, _ = course_data
+    if all_courses_df is None: raise FileNotFoundError("無法載入課程資料，請檢查 data 資料夾")
+    set_shared('course_data', course_data)
+    return {
+        'pool': shared_pool('course_data', workers, loader=load_data), 'rows': len(all_courses_df),
+        'search_index': get_search_index(all_courses_df),
+        'source_columns': set(pd.read_csv(SOURCE_CSV, nrows=0).columns),  # /details 可查詢的欄位
+        'ge_df': all_courses_df[all_courses_df['系所全名'] == '通識教育中心'],
+        'cache': OrderedDict(), 'cache_size': cache_size,
+        'inflight': {},  # 快取鍵 -> 計算中的 Future，相同設定的並行請求共用同一次排課
+        'stats': {'requests': 0, 'computed': 0, 'cache_hits': 0, 'coalesced': 0},
+    }
+
+
+async def schedule(service, settings, k=1):
+    """回傳排課結果的 JSON bytes；先查回應快取，再與計算中的相同請求合併，都沒有才送進 worker pool"""
+    key = f"{k}:{normalize_settings(settings)}"
+    stats, cache = service['stats'], service['cache']
+    if key in cache:
+        stats['cache_hits'] += 1
+        cache.move_to_end(key)
+        return cache[key]
+    task = service['inflight'].get(key)
+    if task is not None:
+        stats['coalesced'] += 1
+    else:
+        task = service['inflight'][key] = asyncio.ensure_future(_compute(service, key, settings, k))
+    # 發出請求的連線中斷時，計算仍繼續並寫入快取，其他等待相同結果的請求不受影響
+    return await asyncio.shield(task)
+
+
+async def _compute(service, key, settings, k):
+    try:
+        records = await asyncio.get_running_loop().run_in_executor(service['pool'], _schedule_job, dict(settings), k)
+    finally:
+        del service['inflight'][key]
+    service['stats']['computed'] += 1
+    body = json.dumps({'plans': records}, ensure_ascii=False, default=str).encode('utf-8')
+    cache = service['cache']
+    cache[key] = body
+    if len(cache) > service['cache_size']: cache.popitem(last=False)
+    return body
+
+
+def _is_str_list(value):
+    return isinstance(value, list) and all(isinstance(item, str) for item in value)
+
+
+def _is_int(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _settings_error(settings):
+    """檢查排課設定的型別與值域，回傳錯誤訊息；格式正確時回傳 None"""
+    missing = [key for key in REQUIRED_SETTINGS if key not in settings]
+    if missing: return f"缺少設定: {', '.join(missing)}"
+    credit_list = settings['CreditList']
+    if not isinstance(credit_list, list) or len(credit_list) != 8 or not all(_is_int(c) and c >= 0 for c in credit_list):
+        return "CreditList 須為 8 個非負整數"
+    lists = [key for key in ('past_courses', 'wanted_courses', 'unwanted_courses', 'SelectNumberList') if settings.get(key) is not None and not _is_str_list(settings[key])]
+    if lists: return f"{', '.join(lists)} 須為字串清單"
+    completed = settings.get('completed_semesters')
+    if completed is not None and (not _is_int(completed) or not 0 <= completed <= 7):
+        return "completed_semesters 須為 0 到 7 的整數"
+    if settings.get('scheduler') not in (None, 'greedy', 'search'): return "scheduler 須為 greedy 或 search"
+    if settings['english_level'] not in ENG_REQ_COURSES: return f"english_level 須為 {'、'.join(ENG_REQ_COURSES)} 之一"
+    if settings['elec_eng_option'] not in ELEC_ENG_OPTIONS: return f"elec_eng_option 須為 {'、'.join(ELEC_ENG_OPTIONS)} 之一"
+    return None
+
+
+async def route(service, method, path, body):
+    """依路徑處理請求，回傳 (狀態碼, JSON bytes)；請求內容格式不符時回傳 400"""
+    if method == 'GET' and path == '/health':
+        return 200, dict(service['stats'], status='ok', rows=service['rows'], cached=len(service['cache']))
+    if method == 'GET' and path == '/departments':
+        return 200, {'departments': sorted(service['search_index']['depts'])}
+    if method != 'POST' or path not in ('/schedule', '/analyze', '/search', '/details'):
+        return 404, {'error': f"不支援的請求: {method} {path}"}
+    try:
+        request = json.loads(body or b'{}')
+    except ValueError:
+        return 400, {'error': "請求內容不是合法的 JSON"}
+    if not isinstance(request, dict):
+        return 400, {'error': "請求內容須為 JSON 物件"}
+
+    if path == '/search':
+        query, dept, limit = request.get('query', ''), request.get('dept'), request.get('limit', DEFAULT_LIMIT)
+        if not isinstance(query, str) or not (dept is None or isinstance(dept, str)) or not _is_int(limit) or limit < 0:
+            return 400, {'error': "query 須為字串、dept 須為字串或 null、limit 須為非負整數"}
+        return 200, {'course_names': search_courses(service['search_index'], query, dept, limit)}
+    if path == '/details':
+        codes, columns = request.get('codes', []), request.get('columns', list(DETAIL_COLUMNS))
+        if not _is_str_list(codes) or not _is_str_list(columns):
+            return 400, {'error': "codes 與 columns 須為字串清單"}
+        unknown = [column for column in columns if column not in service['source_columns'] or column == '科號']
+        if unknown: return 400, {'error': f"不支援的欄位: {', '.join(unknown)}"}
+        details = load_course_details(codes, columns).astype(object)
+        return 200, {'details': details.where(details.notna(), None).to_dict('index')}
+    if path == '/analyze':
+        past_courses = request.get('past_courses', [])
+        if not _is_str_list(past_courses): return 400, {'error': "past_courses 須為字串清單"}
+        all_courses_df, cs_learn_df = get_shared('course_data')
+        return 200, state_to_record(process_past_courses(past_courses, all_courses_df, cs_learn_df, service['ge_df']))
+
+    settings, k = request.get('settings', {}), request.get('k', 1)
+    if not isinstance(settings, dict): return 400, {'error': "settings 須為 JSON 物件"}
+    if not _is_int(k) or k < 1: return 400, {'error': "k 須為正整數"}
+    error = _settings_error(settings)
+    if error: return 400, {'error': error}
+    try:
+        return 200, await schedule(service, settings, k)
+    except Exception as e:
+        return 500, {'error': f"{type(e).__name__}: {e}"}
+
+
+async def handle_connection(service, reader, writer):
+    """極簡 HTTP/1.1：每個連線處理一個請求，以 JSON 回應後關閉"""
+    status, payload = 400, {'error': "無法解析的 HTTP 請求"}
+    try:
+        request_line = (await reader.readline()).decode('latin-1').split()
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''): break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        length = int(headers.get('content-length', 0))
+        if len(request_line) >= 2 and length <= MAX_BODY_BYTES:
+            body = await reader.readexactly(length) if length else b''
+            service['stats']['requests'] += 1
+            try:
+                status, payload = await route(service, request_line[0], request_line[1].split('?')[0], body)
+            except Exception as e:
+                # 未預期的錯誤也回應 500，不讓連線在沒有回應的情況下中斷
+                status, payload = 500, {'error': f"{type(e).__name__}: {e}"}
+    except (ValueError, asyncio.IncompleteReadError, ConnectionError):
+        pass
+    data = payload if isinstance(payload, bytes) else json.dumps(payload, ensure_ascii=False, default=str).encode('utf-8')
+    reason = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 500: 'Internal Server Error'}[status]
+    try:
+        writer.write(f"HTTP/1.1 {status} {reason}\r\nContent-Type: application/json; charset=utf-8\r\n"
+                     f"Content-Length: {len(data)}\r\nConnection: close\r\n\r\n".encode('latin-1') + data)
+        await writer.drain()
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, workers=None, cache_size=RESPONSE_CACHE_SIZE):
+    service = create_service(workers, cache_size)
+    server = await asyncio.start_server(lambda r, w: handle_connection(service, r, w), host, port)
+    print(f"排課服務已啟動: http://{host}:{port} (共 {service['rows']} 筆課程)", file=sys.stderr)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        service['pool'].shutdown(cancel_futures=True)
+
+
+# --- 客戶端 (app.py 與 cli.py 使用) ---
+def _call(url, path, payload=None, timeout=60):
+    data = None if payload is None else json.dumps(payload, ensure_ascii=False).encode('utf-8')
+    request = urllib.request.Request(url.rstrip('/') + path, data=data, headers={'Content-Type': 'application/json'})
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return json.loads(response.read().decode('utf-8'))
+
+
+def request_schedules(url, settings, k=1, timeout=60):
+    """向排課服務取得最多 k 份推薦課表，回傳與 get_recommended_schedule 相同格式的 [(course_list, credit, total_credits, state), ...]"""
+    return [record_to_schedule(record) for record in _call(url, '/schedule', {'settings': settings, 'k': k}, timeout)['plans']]
+
+
+def request_course_search(url, query, dept=None, limit=DEFAULT_LIMIT, timeout=60):
+    """向排課服務搜尋課程，回傳依相符程度排序的中文課名"""
+    return _call(url, '/search', {'query': query, 'dept': dept, 'limit': limit}, timeout)['course_names']
+
+
+def request_course_details(url, codes, columns=DETAIL_COLUMNS, timeout=60):
+    """向排課服務取得精簡目錄未收錄的欄位，回傳與 load_course_details 相同格式的 DataFrame"""
+    codes = pd.Index(codes).drop_duplicates()
+    details = _call(url, '/details', {'codes': codes.tolist(), 'columns': list(columns)}, timeout)['details']
+    return pd.DataFrame.from_dict(details, orient='index', columns=list(columns)).reindex(codes)
+
+
+def request_departments(url, timeout=60):
+    return _call(url, '/departments', timeout=timeout)['departments']
+
+
+def request_past_course_state(url, past_courses, timeout=60):
+    """向排課服務分析已修課程，回傳 process_past_courses 的統計欄位"""
+    return _call(url, '/analyze', {'past_courses': past_courses}, timeout)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="清大課程推薦系統 - 本機排課服務")
+    parser.add_argument('--host', default=DEFAULT_HOST, help=f"監聽位址 (預設: {DEFAULT_HOST})")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help=f"監聽埠號 (預設: {DEFAULT_PORT})")
+    parser.add_argument('--workers', type=int, default=None, help="排課 worker 行程數 (預設: CPU 核心數)")
+    parser.add_argument('--cache-size', type=int, default=RESPONSE_CACHE_SIZE,
+                        help=f"回應快取保留的設定組數 (預設: {RESPONSE_CACHE_SIZE})")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers, args.cache_size))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
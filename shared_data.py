@@ -0,0 +1,26 @@
+from concurrent.futures import ProcessPoolExecutor
+
+# 平行計算時各 worker 行程共用的唯讀資料，依名稱存放 (fork 時直接繼承主行程已設定的資料，不必重新載入或傳送)
+_SHARED = {}
+
+
+def set_shared(name, value):
+    _SHARED[name] = value
+
+
+def get_shared(name):
+    return _SHARED[name]
+
+
+def _init_shared(name, value, loader):
+    if _SHARED.get(name) is None:
+        _SHARED[name] = loader() if loader is not None else value
+
+
+def shared_pool(name, workers=None, loader=None):
+    """
+    建立共用 name 資料的 ProcessPoolExecutor，呼叫前須先以 set_shared 設定主行程的值。
+    fork 時 worker 直接繼承該值；其他啟動方式改在 worker 中呼叫 loader() 載入，未指定 loader 時在啟動時傳入一次主行程的值。
+    """
+    value = _SHARED[name] if loader is None else None
+    return ProcessPoolExecutor(max_workers=workers, initializer=_init_shared, initargs=(name, value, loader))
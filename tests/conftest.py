@@ -0,0 +1,24 @@
+import os
+import sys
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from course_logic import load_data  # noqa: E402
+
+
+@pytest.fixture(scope='session', autouse=True)
+def repo_cwd():
+    """程式以 ./data/ 相對路徑讀取資料，測試一律在專案根目錄執行"""
+    cwd = os.getcwd()
+    os.chdir(ROOT)
+    yield ROOT
+    os.chdir(cwd)
+
+
+@pytest.fixture(scope='session')
+def course_data(repo_cwd):
+    all_courses_df, cs_learn_df = load_data()
+    if all_courses_df is None: pytest.skip("找不到 data 資料夾中的課程資料")
+    return all_courses_df, cs_learn_df
@@ -0,0 +1,53 @@
+import io
+import random
+from contextlib import redirect_stdout
+from course_logic import GREEDY_PHASES, ELEC_ENG_OPTIONS, get_prepared_courses_and_settings, get_recommended_schedule
+
+# 必修、英文、專業選修與通識中常被排入的課名，加入不想上的課程時較容易改變已排好的階段
+PLACED_NAMES = ['軟體工程', '人工智慧概論', '資料結構', '線性代數', '中級英文二', '微積分Ｂ一', '統計思維與分析']
+
+
+def schedule_signature(result):
+    course_lists, credits, _, initial_state = result
+    return ([df['科號'].tolist() if not df.empty else [] for df in course_lists], list(credits),
+            sorted(initial_state['fulfilled_reqs']), initial_state['ge_credits'])
+
+
+def random_setting_changes(names, steps, seed):
+    """從一組基準設定出發，每步隨機改變一項設定並回傳新的設定"""
+    rng = random.Random(seed)
+    settings = dict(SelectNumberList=[], EnglishNameList=['1', '2'], SelectCourse='X', SelectType='A', CreditList=[16, 16, 18, 20, 20, 20, 9, 9],
+                    english_level='前標', elec_eng_option=ELEC_ENG_OPTIONS[0], unwanted_courses=[])
+    for _ in range(steps):
+        settings = dict(settings)
+        r = rng.random()
+        if r < 0.4:
+            credit_list = list(settings['CreditList'])
+            sem = rng.randrange(8)
+            credit_list[sem] = max(0, credit_list[sem] + rng.choice([-3, -1, 1, 2, 4]))
+            settings['CreditList'] = credit_list
+        elif r < 0.6:
+            settings['unwanted_courses'] = settings['unwanted_courses'] + rng.sample(names, rng.randint(0, 3)) + rng.sample(PLACED_NAMES, 1)
+        elif r < 0.7 and settings['unwanted_courses']:
+            settings['unwanted_courses'] = settings['unwanted_courses'][:-1]
+        elif r < 0.8:
+            settings['SelectType'] = rng.choice('ABCD')
+        elif r < 0.9:
+            settings['SelectCourse'] = rng.choice('XYZ')
+        else:
+            settings['elec_eng_option'] = rng.choice(ELEC_ENG_OPTIONS)
+        yield settings
+
+
+def test_resumed_schedules_match_full_recompute(course_data):
+    all_courses_df, cs_learn_df = course_data
+    names = sorted(all_courses_df['中文課名'].dropna().unique())
+    checkpoints, resumed = {}, 0
+    for settings in random_setting_changes(names, 40, seed=7):
+        frames = get_prepared_courses_and_settings(all_courses_df, settings)
+        with redirect_stdout(io.StringIO()):
+            fresh = get_recommended_schedule(settings, *frames, cs_learn_df)
+            resumed_result = get_recommended_schedule(settings, *frames, cs_learn_df, checkpoints=checkpoints)
+        assert schedule_signature(resumed_result) == schedule_signature(fresh), settings
+        resumed += checkpoints['resumed_from'] != GREEDY_PHASES[0]
+    assert resumed > 0  # 確認確實有從檢查點分岔，而非每次都從頭重排
@@ -0,0 +1,26 @@
+import pytest
+from course_logic import get_prepared_courses_and_settings
+from credit_sweep import sweep_credit_plans
+
+CREDIT_PLANS = [[20, 20, 20, 20, 12, 12, 12, 12], [16, 16, 16, 16, 16, 16, 16, 16]]
+
+
+def make_settings(scheduler):
+    return dict(SelectNumberList=[], EnglishNameList=[], EnglishCourseNames=[], SelectCourse='X', SelectType='A',
+                CreditList=CREDIT_PLANS[0], english_level='前標', elec_eng_option="請推薦2門「選修英文」",
+                scheduler=scheduler, search_time_limit=0.2)
+
+
+@pytest.mark.parametrize('scheduler', ['greedy', 'search'])
+def test_sweep_runs_with_each_scheduler(course_data, scheduler):
+    all_courses_df, cs_learn_df = course_data
+    settings = make_settings(scheduler)
+    frames = get_prepared_courses_and_settings(all_courses_df, settings)
+    table, pareto = sweep_credit_plans(settings, *frames, cs_learn_df, CREDIT_PLANS)
+    assert table['方案'].tolist() == [1, 2]
+    assert (table['總學分'] > 0).all()
+    assert len(pareto) >= 1
+    if scheduler == 'search':
+        assert (table['從此階段分岔'] == '-').all()
+    else:
+        assert (table['從此階段分岔'] != '-').all()
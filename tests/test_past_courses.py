@@ -0,0 +1,73 @@
+import random
+import pandas as pd
+import pytest
+from course_logic import process_past_courses, get_prepared_courses_and_settings, REVERSE_SUB_MAP, ENG_REQ_COURSES, FOREIGN_LANG_DEPTS
+
+
+def reference_process_past_courses(past_courses_names, all_courses_df, cs_learn_df, ge_df):
+    """向量化之前以 iterrows 逐門累計的版本，作為比對基準"""
+    initial_state = {
+        'fulfilled_reqs': set(), 'ge_credits': 0, 'eecs_credits': 0,
+        'eng_req_completed': 0, 'eng_elec_completed': 0,
+        'initial_result_df': pd.DataFrame()
+    }
+    if not past_courses_names:
+        return initial_state
+    past_courses_info = all_courses_df[all_courses_df['中文課名'].isin(past_courses_names)].drop_duplicates(subset=['中文課名'])
+
+    for _, course in past_courses_info.iterrows():
+        name, dept, code, credit = course['中文課名'], course['系所全名'], course['科號'], course['學分']
+        if name in cs_learn_df['中文課名'].values: initial_state['fulfilled_reqs'].add(name)
+        if name in REVERSE_SUB_MAP: initial_state['fulfilled_reqs'].add(REVERSE_SUB_MAP[name])
+        if name in ge_df['中文課名'].values: initial_state['ge_credits'] += credit
+
+        target_prefixes = ['EE', 'CS', 'ISA', 'COM']
+        is_cs_required = name in cs_learn_df['中文課名'].values
+        if any(p in code for p in target_prefixes) and not is_cs_required:
+            initial_state['eecs_credits'] += credit
+        if name in ENG_REQ_COURSES["前標"] or name in ENG_REQ_COURSES["頂標"]:
+            initial_state['eng_req_completed'] += 1
+            initial_state['fulfilled_reqs'].add(name)
+        elif dept in ['英語教育中心(110起)', '英語教育中心']:
+            initial_state['eng_elec_completed'] += 1
+        elif dept in FOREIGN_LANG_DEPTS:
+            initial_state['eng_elec_completed'] += 1
+
+    initial_state['initial_result_df'] = past_courses_info
+    return initial_state
+
+
+def random_name_sets(all_courses_df, cs_learn_df, count, seed=0):
+    """隨機課名組合，刻意混入必修、替代課程、英文、外語與通識課名，並夾雜不存在的課名"""
+    rng = random.Random(seed)
+    names = all_courses_df['中文課名'].dropna().unique().tolist()
+    depts = all_courses_df['系所全名']
+    special = sorted(set(cs_learn_df['中文課名']) | set(REVERSE_SUB_MAP) | set(ENG_REQ_COURSES['前標'] + ENG_REQ_COURSES['頂標'])
+                     | set(all_courses_df.loc[depts.isin(['英語教育中心(110起)', '英語教育中心'] + FOREIGN_LANG_DEPTS), '中文課名'].dropna())
+                     | set(all_courses_df.loc[depts == '通識教育中心', '中文課名'].dropna()))
+    for _ in range(count):
+        chosen = rng.sample(names, rng.randint(0, 15)) + rng.sample(special, rng.randint(0, 15))
+        if rng.random() < 0.2: chosen.append('不存在的課程')
+        rng.shuffle(chosen)
+        yield chosen
+
+
+def assert_same_state(actual, expected):
+    assert actual['fulfilled_reqs'] == expected['fulfilled_reqs']
+    for key in ['ge_credits', 'eecs_credits']:
+        assert actual[key] == pytest.approx(expected[key])
+    for key in ['eng_req_completed', 'eng_elec_completed']:
+        assert actual[key] == expected[key]
+    pd.testing.assert_frame_equal(actual['initial_result_df'], expected['initial_result_df'])
+
+
+@pytest.mark.parametrize('frame', ['catalog', 'prepared'])
+def test_matches_iterrows_reference(course_data, frame):
+    all_courses_df, cs_learn_df = course_data
+    if frame == 'prepared':
+        settings = dict(SelectNumberList=['1', '2'], SelectType='A', unwanted_courses=[])
+        all_courses_df = get_prepared_courses_and_settings(all_courses_df, settings)[0]
+    ge_df = all_courses_df[all_courses_df['系所全名'] == '通識教育中心']
+    for names in random_name_sets(all_courses_df, cs_learn_df, 200):
+        assert_same_state(process_past_courses(names, all_courses_df, cs_learn_df, ge_df),
+                          reference_process_past_courses(names, all_courses_df, cs_learn_df, ge_df))
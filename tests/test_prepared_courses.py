@@ -0,0 +1,17 @@
+from course_logic import get_prepared_courses_and_settings
+
+SETTINGS = dict(SelectNumberList=['1'], SelectType='A')
+
+
+def test_missing_or_null_unwanted_courses_share_the_cached_frames(course_data):
+    all_courses_df, _ = course_data
+    omitted = get_prepared_courses_and_settings(all_courses_df, SETTINGS)
+    for unwanted in (None, []):
+        prepared = get_prepared_courses_and_settings(all_courses_df, dict(SETTINGS, unwanted_courses=unwanted))
+        assert all(a is b for a, b in zip(prepared, omitted))
+
+
+def test_unwanted_courses_are_excluded(course_data):
+    all_courses_df, _ = course_data
+    AllCoursesData, _, _ = get_prepared_courses_and_settings(all_courses_df, dict(SETTINGS, unwanted_courses=['線性代數']))
+    assert '線性代數' not in set(AllCoursesData['中文課名'])
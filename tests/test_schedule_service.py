@@ -0,0 +1,85 @@
+import json
+import asyncio
+import pytest
+import schedule_service
+import shared_data
+from schedule_service import route, handle_connection, _settings_error
+from course_index import get_search_index
+
+SETTINGS = dict(CreditList=[20, 20, 20, 20, 12, 12, 12, 12], SelectNumberList=[], SelectType='A', SelectCourse='X')
+VALID_SETTINGS = dict(SETTINGS, english_level='前標', elec_eng_option="我已滿足此要求")
+
+
+@pytest.fixture
+def service(course_data, monkeypatch):
+    """不建立 worker pool 的服務狀態，只測試不需要排課的路徑與輸入檢查"""
+    all_courses_df, _ = course_data
+    monkeypatch.setitem(shared_data._SHARED, 'course_data', course_data)
+    return {'search_index': get_search_index(all_courses_df), 'source_columns': {'科號', '教室'},
+            'ge_df': all_courses_df[all_courses_df['系所全名'] == '通識教育中心'],
+            'cache': {}, 'rows': len(all_courses_df), 'stats': {'requests': 0}}
+
+
+def post(service, path, payload):
+    return asyncio.run(route(service, 'POST', path, json.dumps(payload).encode('utf-8')))
+
+
+@pytest.mark.parametrize('path, payload', [
+    ('/schedule', [1, 2]),
+    ('/schedule', {'settings': SETTINGS}),  # 缺少 english_level 與 elec_eng_option
+    ('/schedule', {'settings': [], 'k': 1}),
+    ('/schedule', {'settings': VALID_SETTINGS, 'k': '2'}),
+    ('/schedule', {'settings': dict(VALID_SETTINGS, CreditList=[20] * 7)}),
+    ('/schedule', {'settings': dict(VALID_SETTINGS, CreditList=[20] * 7 + [-1])}),
+    ('/schedule', {'settings': dict(VALID_SETTINGS, CreditList=[20] * 7 + ['12'])}),
+    ('/schedule', {'settings': dict(VALID_SETTINGS, past_courses='線性代數')}),
+    ('/schedule', {'settings': dict(VALID_SETTINGS, wanted_courses=[1])}),
+    ('/schedule', {'settings': dict(VALID_SETTINGS, unwanted_courses={'a': 1})}),
+    ('/schedule', {'settings': dict(VALID_SETTINGS, SelectNumberList='1')}),
+    ('/schedule', {'settings': dict(VALID_SETTINGS, completed_semesters=8)}),
+    ('/schedule', {'settings': dict(VALID_SETTINGS, completed_semesters='2')}),
+    ('/schedule', {'settings': dict(VALID_SETTINGS, scheduler='beam')}),
+    ('/schedule', {'settings': dict(VALID_SETTINGS, english_level='中標')}),
+    ('/schedule', {'settings': dict(VALID_SETTINGS, elec_eng_option='不修')}),
+    ('/search', {'query': '微積', 'dept': ['資訊工程學系']}),
+    ('/search', {'query': '微積', 'limit': '3'}),
+    ('/analyze', {'past_courses': '線性代數'}),
+    ('/details', {'codes': ['x'], 'columns': ['不存在的欄位']}),
+])
+def test_malformed_requests_are_rejected(service, path, payload):
+    status, body = post(service, path, payload)
+    assert status == 400 and 'error' in body
+
+
+def test_valid_settings_pass_validation():
+    assert _settings_error(VALID_SETTINGS) is None
+    assert _settings_error(dict(VALID_SETTINGS, completed_semesters=7, scheduler='search', unwanted_courses=None)) is None
+
+
+def test_search_and_analyze(service):
+    assert post(service, '/search', {'query': '線性代數', 'limit': 1}) == (200, {'course_names': ['線性代數']})
+    status, body = post(service, '/analyze', {'past_courses': ['線性代數']})
+    assert status == 200 and body['fulfilled_reqs'] == ['線性代數']
+
+
+class FakeWriter:
+    def __init__(self): self.data, self.closed = b'', False
+    def write(self, data): self.data += data
+    async def drain(self): pass
+    def close(self): self.closed = True
+
+
+def test_unexpected_errors_still_get_a_response(service, monkeypatch):
+    async def broken_route(*args):
+        raise RuntimeError("boom")
+    monkeypatch.setattr(schedule_service, 'route', broken_route)
+
+    async def run():
+        reader = asyncio.StreamReader()
+        reader.feed_data(b'POST /search HTTP/1.1\r\nContent-Length: 2\r\n\r\n{}')
+        reader.feed_eof()
+        writer = FakeWriter()
+        await handle_connection(service, reader, writer)
+        return writer
+    writer = asyncio.run(run())
+    assert writer.data.startswith(b'HTTP/1.1 500') and b'boom' in writer.data and writer.closed
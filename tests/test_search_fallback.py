@@ -0,0 +1,19 @@
+import pytest
+from benchmark import SETTINGS_PROFILES
+from course_logic import get_prepared_courses_and_settings, get_recommended_schedule
+
+
+def fulfilled_count(course_data, settings):
+    all_courses_df, cs_learn_df = course_data
+    frames = get_prepared_courses_and_settings(all_courses_df, settings)
+    _, _, _, state = get_recommended_schedule(settings, *frames, cs_learn_df)
+    return len(state['fulfilled_reqs']), state.get('search_stats')
+
+
+@pytest.mark.parametrize('name', list(SETTINGS_PROFILES))
+def test_search_out_of_time_meets_greedy_requirements(course_data, name):
+    """搜尋時間用完 (甚至還沒建立完候選) 時，滿足的需求不可少於貪婪流程"""
+    greedy, _ = fulfilled_count(course_data, dict(SETTINGS_PROFILES[name], scheduler='greedy'))
+    search, stats = fulfilled_count(course_data, dict(SETTINGS_PROFILES[name], scheduler='search', search_time_limit=1e-6))
+    assert not stats['complete']
+    assert search >= greedy